@@ -0,0 +1,5 @@
+"""Reusable building blocks for the product sales analysis.
+
+``product_sales.py`` is the exploratory walk-through of a single export; the
+modules in this package hold the pieces that have to scale past it.
+"""
@@ -0,0 +1,3 @@
+from sales_analysis.cli import main
+
+main()
@@ -0,0 +1,108 @@
+"""Single pass KPI aggregation with mergeable partial state.
+
+All the rollups in ``product_sales.py`` (weekly totals and means per sales
+method, the state segment, the top states per method and the AOV) are sums
+and counts over some subset of (week, sales_method, state). One groupby at
+that grain gives a small cube of sums, sums of squares and counts; every
+table is derived from the cube, and cubes from different chunks or weekly
+files merge by adding them up. Incremental appends of new exports go
+through `sales_analysis.store`, which keeps unfilled cubes per file.
+"""
+import pandas as pd
+
+from sales_analysis.cleaning import sales_method_category
+
+KEYS = ['week', 'sales_method', 'state']
+METRICS = ['revenue', 'nb_sold', 'years_as_customer', 'nb_site_visits']
+
+
+def partial_aggregates(df):
+    """Sum, sum of squares and count of every metric per (week, sales_method, state) in one pass."""
+    #squares in float64, the int16 columns would overflow
+    squares = {f'{metric}_sq_sum': df[metric].astype('float64') ** 2 for metric in METRICS}
+    grouped = df[KEYS + METRICS].assign(**squares).groupby(KEYS, observed=True)
+    sums = grouped[METRICS].sum().add_suffix('_sum')
+    sumsq = grouped[list(squares)].sum()
+    counts = grouped[METRICS].count().add_suffix('_count')
+    cube = pd.concat([grouped.size().rename('n'), sums, sumsq, counts], axis=1).reset_index()
+    return _normalise(cube)
+
+
+def merge_aggregates(cubes):
+    """Combine partial cubes from chunks, files or weeks into one."""
+    cubes = [cube for cube in cubes if cube is not None and len(cube)]
+    if not cubes:
+        return None
+    cube = pd.concat(cubes, ignore_index=True)
+    return _normalise(cube.groupby(KEYS, observed=True).sum().reset_index())
+
+
+def aggregate_chunks(chunks):
+    """Cube for an iterable of cleaned chunks, e.g. `streaming.iter_cleaned`."""
+    cube = None
+    for chunk in chunks:
+        cube = merge_aggregates([cube, partial_aggregates(chunk)])
+    return cube
+
+
+def fill_missing_revenue(cube, state_medians):
+    """Account for revenue gaps filled with the state median.
+
+    For a cube built from rows whose revenue was not filled yet; gives the
+    same cube as filling first and aggregating after, so partitions can be
+    aggregated before the global medians are known.
+    """
+    medians = cube['state'].map(state_medians).astype('float64')
+    missing = (cube['n'] - cube['revenue_count']).where(medians.notna(), 0)
+    return cube.assign(
+        revenue_sum=cube['revenue_sum'] + missing * medians.fillna(0),
+        revenue_sq_sum=cube['revenue_sq_sum'] + missing * medians.fillna(0) ** 2,
+        revenue_count=cube['revenue_count'] + missing,
+    )
+
+
+def _normalise(cube):
+    #state categories differ between chunks, so the cube keys on plain strings
+    return cube.astype({'state': 'str'}).assign(sales_method=sales_method_category(cube['sales_method']))
+
+
+##tables derived from the cube
+
+def _rollup(cube, by, metrics, stat):
+    grouped = cube.groupby(by, observed=True)
+    sums = grouped[[f'{metric}_sum' for metric in metrics]].sum()
+    sums.columns = metrics
+    if stat == 'sum':
+        return sums.reset_index()
+    counts = grouped[[f'{metric}_count' for metric in metrics]].sum()
+    counts.columns = metrics
+    return (sums / counts).reset_index()
+
+
+def sales_per_week(cube):
+    return _rollup(cube, ['week', 'sales_method'], ['nb_sold', 'revenue'], 'sum')
+
+
+def avg_sales_per_week(cube):
+    return _rollup(cube, ['week', 'sales_method'], ['nb_sold', 'revenue'], 'mean')
+
+
+def avg_site_visits(cube):
+    return _rollup(cube, 'sales_method', ['nb_site_visits'], 'mean')
+
+
+def state_segment(cube):
+    return _rollup(cube, 'state', METRICS, 'sum')
+
+
+def top_states(cube, metric='revenue', n=10, sales_method=None):
+    """Top `n` states by total `metric`, optionally for one sales method."""
+    if sales_method is not None:
+        cube = cube[cube['sales_method'] == sales_method]
+    totals = _rollup(cube, 'state', [metric], 'sum')
+    return totals.sort_values(metric, ascending=False).reset_index(drop=True)[:n]
+
+
+def average_order_value(cube):
+    """Mean revenue per order for each sales method."""
+    return _rollup(cube, 'sales_method', ['revenue'], 'mean').set_index('sales_method')['revenue']
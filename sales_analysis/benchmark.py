@@ -0,0 +1,210 @@
+"""Stage by stage benchmarks of the analysis.
+
+Every stage is timed on its own and reports wall time, rows per second and
+peak resident memory. Inputs are either an existing export or synthetic
+exports from `sales_analysis.synthetic` at the requested sizes. Results are
+appended as JSON lines tagged with the git revision and library versions,
+so runs from different versions can be compared.
+
+The in-memory stages (``load`` to ``plot:*``) hold the whole export; for
+sizes beyond memory benchmark the streaming stages only, e.g.
+``--stages stream_clean stream_kpis``.
+"""
+import datetime
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+
+from sales_analysis.profiling import peak_rss_mb, reset_peak_rss
+
+
+def _load(path, state):
+    import pandas as pd
+
+    from sales_analysis.streaming import read_chunks
+
+    state['raw'] = pd.concat(read_chunks(path), ignore_index=True)
+    return len(state['raw'])
+
+
+def _clean(path, state):
+    from sales_analysis.cleaning import clean_chunk
+
+    state['cleaned'] = clean_chunk(state['raw'])
+    return len(state['raw'])
+
+
+def _impute(path, state):
+    from sales_analysis.cleaning import fill_revenue
+
+    medians = state['cleaned'].groupby('state', observed=True)['revenue'].median()
+    state['df'] = fill_revenue(state['cleaned'], medians)
+    return len(state['df'])
+
+
+def _kpis(path, state):
+    from sales_analysis import aggregates
+    from sales_analysis.parallel import kpi_tables
+
+    state['cube'] = aggregates.partial_aggregates(state['df'])
+    kpi_tables(state['cube'])
+    return len(state['df'])
+
+
+def _validate(path, state):
+    from sales_analysis.validation import validate
+
+    validate(state['raw'])
+    return len(state['raw'])
+
+
+def _figure_inputs(path, state):
+    from sales_analysis.report import figure_inputs
+
+    state['inputs'] = figure_inputs(state['df'], state['cube'])
+    return len(state['df'])
+
+
+def _plot(name):
+    def run(path, state):
+        from sales_analysis.report import render_figure
+
+        render_figure(name, state['inputs'][name], os.path.join(state['tmp'], f'{name}.png'))
+        return len(state['df'])
+    return run
+
+
+def _plot_setup():
+    #keep the one-off matplotlib/seaborn import out of the first plot's time
+    import matplotlib
+    matplotlib.use('Agg')
+    import seaborn
+
+
+def _stream_clean(path, state):
+    from sales_analysis.streaming import clean_csv
+
+    return clean_csv(path, os.path.join(state['tmp'], 'clean.csv'))
+
+
+def _stream_kpis(path, state):
+    from sales_analysis.parallel import analyse_files
+
+    cube = analyse_files(path)
+    return int(cube['n'].sum())
+
+
+def _stages():
+    from sales_analysis.report import RENDERERS
+
+    stages = {
+        'load': (_load, None),
+        'clean': (_clean, 'load'),
+        'impute': (_impute, 'clean'),
+        'kpis': (_kpis, 'impute'),
+        'validate': (_validate, 'load'),
+        'figure_inputs': (_figure_inputs, 'kpis'),
+    }
+    for name in RENDERERS:
+        stages[f'plot:{name}'] = (_plot(name), 'figure_inputs')
+    stages['stream_clean'] = (_stream_clean, None)
+    stages['stream_kpis'] = (_stream_kpis, None)
+    return stages
+
+
+def _environment():
+    import numpy as np
+    import pandas as pd
+
+    try:
+        revision = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip() or None
+    except OSError:
+        revision = None
+    return {
+        'revision': revision,
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+    }
+
+
+def run_benchmark(path, stages=None):
+    """One result per stage in `stages` (default: all) for the export at `path`.
+
+    Stages the selected ones depend on are run first but not reported.
+    """
+    all_stages = _stages()
+    selected = list(all_stages) if stages is None else list(stages)
+    unknown = set(selected) - set(all_stages)
+    if unknown:
+        raise ValueError(f'Unknown stages: {", ".join(sorted(unknown))}')
+
+    results = []
+    done = set()
+    with tempfile.TemporaryDirectory() as tmp:
+        state = {'tmp': tmp}
+
+        def run(name, record):
+            stage, requires = all_stages[name]
+            if requires is not None and requires not in done:
+                run(requires, record=False)
+            if name.startswith('plot:'):
+                _plot_setup()
+            exact_peak = reset_peak_rss()
+            start_cpu = time.process_time()
+            start = time.perf_counter()
+            rows = stage(path, state)
+            seconds = time.perf_counter() - start
+            done.add(name)
+            if record:
+                results.append({
+                    'stage': name,
+                    'rows': rows,
+                    'seconds': seconds,
+                    'cpu_seconds': time.process_time() - start_cpu,
+                    'rows_per_s': rows / seconds if seconds else None,
+                    'peak_rss_mb': peak_rss_mb(),
+                    #without a reset the peak covers the whole process so far
+                    'peak_rss_is_stage': exact_peak,
+                })
+
+        for name in selected:
+            run(name, record=True)
+    return results
+
+
+def benchmark_sizes(sizes, stages=None, seed=0, data_dir=None):
+    """`run_benchmark` on synthetic exports of each size in `sizes`."""
+    from sales_analysis.synthetic import write_csv
+
+    results = []
+    if data_dir:
+        os.makedirs(data_dir, exist_ok=True)
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in sizes:
+            path = os.path.join(data_dir or tmp, f'product_sales_{size}.csv')
+            if not os.path.exists(path):
+                write_csv(path, size, seed)
+            for result in run_benchmark(path, stages):
+                results.append({'input_rows': size, **result})
+    return results
+
+
+def write_results(results, out_path, source):
+    """Append `results` to the JSON lines file `out_path`."""
+    run = {
+        'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+        'source': source,
+        **_environment(),
+    }
+    with open(out_path, 'a') as f:
+        for result in results:
+            f.write(json.dumps({**run, **result}) + '\n')
@@ -0,0 +1,97 @@
+"""Columnar cache of the cleaned dataset.
+
+Cleaning an export means parsing the csv and running every rule in
+`sales_analysis.cleaning`. The result only changes when the file's content,
+the cleaning rules or the founding-year bound change, so it is stored as an
+uncompressed Arrow IPC file keyed on those and memory-mapped on later runs.
+The file holds a single record batch, so the numeric columns load as
+zero-copy views on the mapped pages; strings and categoricals are still
+converted into pandas memory. Needs pyarrow.
+"""
+import hashlib
+import os
+
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+from sales_analysis.cleaning import CLEANING_VERSION, max_years_as_customer, sales_method_category
+from sales_analysis.streaming import CHUNKSIZE, iter_cleaned
+
+CACHE_DIR = '.sales_cache'
+
+
+def file_hash(path, block_size=1 << 20):
+    """sha256 of the file's content."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def cache_path(path, cache_dir=CACHE_DIR, current_year=None):
+    """Where the cleaned copy of `path` is cached."""
+    stem = os.path.splitext(os.path.basename(path))[0]
+    key = f'{file_hash(path)[:16]}-v{CLEANING_VERSION}-y{max_years_as_customer(current_year)}'
+    return os.path.join(cache_dir, f'{stem}-{key}.arrow')
+
+
+def clean_frame(path, chunksize=CHUNKSIZE, current_year=None):
+    """Cleaned copy of `path` as one frame with compact dtypes."""
+    chunks = list(iter_cleaned(path, chunksize, current_year))
+    if not chunks:
+        return pd.DataFrame()
+    #each chunk has its own state categories; union them instead of going through object
+    states = union_categoricals([chunk['state'] for chunk in chunks])
+    df = pd.concat([chunk.drop(columns='state') for chunk in chunks], ignore_index=True)
+    df['state'] = pd.Categorical(states)
+    #chunks that met different unknown sales methods have different categories
+    df['sales_method'] = sales_method_category(df['sales_method'])
+    return df
+
+
+def _read_cache(cached):
+    from pyarrow import feather
+
+    #split_blocks keeps each numeric column as its own view instead of consolidating (copying) them
+    return feather.read_table(cached, memory_map=True).to_pandas(split_blocks=True)
+
+
+def load_clean(path, cache_dir=CACHE_DIR, chunksize=CHUNKSIZE, current_year=None):
+    """Cleaned copy of `path`, from the cache when the file hasn't changed.
+
+    The frame is always read back from the cache file, also right after
+    building it, so its numeric columns are read-only views on the file on
+    every run; assign whole columns, or copy the frame, rather than writing
+    in place.
+    """
+    import pyarrow as pa
+    from pyarrow import feather
+
+    cached = cache_path(path, cache_dir, current_year)
+    if os.path.exists(cached):
+        return _read_cache(cached)
+
+    df = clean_frame(path, chunksize, current_year)
+    os.makedirs(cache_dir, exist_ok=True)
+    #write next to the target and rename, so a crashed run never leaves half a cache file
+    tmp = f'{cached}.{os.getpid()}.tmp'
+    #one record batch: a column split over several batches has to be concatenated (copied) on load
+    feather.write_feather(
+        pa.Table.from_pandas(df, preserve_index=False).combine_chunks(), tmp, compression='uncompressed',
+        chunksize=max(len(df), 1),
+    )
+    os.replace(tmp, cached)
+    #drop the in-memory copy for the mapped one, so a cache miss behaves like a hit
+    del df
+    return _read_cache(cached)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Build or refresh the cleaned-data cache for an export.')
+    parser.add_argument('path', help='raw export, e.g. product_sales.csv')
+    parser.add_argument('--cache-dir', default=CACHE_DIR)
+    args = parser.parse_args()
+    print(f'Cleaned rows:{len(load_clean(args.path, args.cache_dir))}')
@@ -0,0 +1,85 @@
+"""Cleaning rules for the product sales export.
+
+These are the same rules ``product_sales.py`` applies to the whole frame,
+written so they can be applied to one chunk at a time.
+"""
+import datetime
+
+import pandas as pd
+
+##dtypes used when reading the export, so each chunk is parsed straight
+##into compact columns instead of int64/object; the integers are nullable
+##so an empty cell is read as missing instead of failing the read
+DTYPES = {
+    'week': 'Int8',
+    'sales_method': 'str',
+    'customer_id': 'str',
+    'nb_sold': 'Int16',
+    'revenue': 'float64',
+    'years_as_customer': 'Int16',
+    'nb_site_visits': 'Int16',
+    'state': 'category',
+}
+
+##every KPI is grouped by these, so rows missing one are dropped
+KEY_COLUMNS = ['week', 'sales_method', 'state']
+
+##bump whenever a rule below changes, so cached cleaned data is rebuilt
+CLEANING_VERSION = 2
+
+YEAR_FOUNDED = 1984
+
+##'em + call' and 'email' are typos of the two email based methods
+SALES_METHOD_MAP = {'em + call': 'Email + Call', 'email': 'Email'}
+SALES_METHODS = ['Email', 'Call', 'Email + Call']
+
+
+def max_years_as_customer(current_year=None):
+    """Longest possible customer relationship, in years, for `current_year`."""
+    if current_year is None:
+        current_year = datetime.date.today().year
+    return current_year - YEAR_FOUNDED + 1
+
+
+def sales_method_category(values):
+    """`values` with the known typos fixed, as a category.
+
+    The three sales methods come first so their codes are the same in every
+    chunk; any other spelling is kept as a category of its own, as the
+    whole-frame analysis does, rather than becoming missing.
+    """
+    values = values.astype('str').replace(SALES_METHOD_MAP)
+    other = sorted(set(values.unique()) - set(SALES_METHODS))
+    return values.astype(pd.CategoricalDtype(SALES_METHODS + other))
+
+
+def _compact_integers(chunk):
+    #nullable integers only where the chunk has a missing value, so the rest stay plain numpy
+    compact = {
+        column: dtype.lower() for column, dtype in DTYPES.items()
+        if dtype.startswith('Int') and column in chunk and not chunk[column].hasnans
+    }
+    return chunk.astype(compact)
+
+
+def clean_chunk(chunk, current_year=None):
+    """Apply the row level cleaning rules to `chunk`.
+
+    Drops rows missing a week, sales method or state (the validation
+    ``nulls`` rule reports how many) and customers older than the business,
+    normalises the sales method spelling and converts it to a category.
+    Missing nb_sold, years_as_customer or nb_site_visits values are kept and
+    left out of that metric's sums and means. Revenue is left as is; the
+    per-state median fill needs the whole dataset (see `fill_revenue`).
+    """
+    chunk = chunk.dropna(subset=KEY_COLUMNS)
+    #a missing years_as_customer is not known to be too old
+    chunk = chunk[~(chunk['years_as_customer'] > max_years_as_customer(current_year)).fillna(False)]
+    chunk = chunk.assign(sales_method=sales_method_category(chunk['sales_method']))
+    return _compact_integers(chunk)
+
+
+def fill_revenue(chunk, state_medians):
+    """Fill missing revenue with the median revenue of the row's state."""
+    fill = chunk['state'].map(state_medians).astype('float64')
+    return chunk.assign(revenue=chunk['revenue'].fillna(fill))
@@ -0,0 +1,114 @@
+"""Command line for the product sales analysis: ``python -m sales_analysis``.
+
+Only argparse is imported up front; each subcommand imports what it needs
+when it runs, so ``kpis`` never loads matplotlib or seaborn.
+"""
+import argparse
+
+#same as streaming.CHUNKSIZE, repeated so parsing arguments doesn't import pandas
+CHUNKSIZE = 1_000_000
+
+
+def _clean(args, tracer):
+    if args.cache:
+        from sales_analysis.cache import load_clean
+
+        with tracer.stage('load_clean') as span:
+            rows = len(span.output(load_clean(args.path, args.cache_dir, args.chunksize)))
+    else:
+        from sales_analysis.streaming import clean_csv
+
+        with tracer.stage('clean_csv'):
+            rows = clean_csv(args.path, args.out, args.chunksize)
+    print(f'Cleaned rows:{rows}')
+
+
+def _kpis(args, tracer):
+    from sales_analysis.parallel import analyse_files, kpi_tables
+
+    with tracer.stage('analyse_files') as span:
+        cube = span.output(analyse_files(args.source, args.workers, args.chunksize))
+    with tracer.stage('kpi_tables', cube):
+        tables = kpi_tables(cube, args.n)
+    for name, table in tables.items():
+        print(f'\n{name}')
+        print(table.to_string())
+
+
+def _report(args, tracer):
+    from sales_analysis import cache
+    from sales_analysis.report import RENDERERS, render_report
+
+    with tracer.stage('load_clean') as span:
+        df = span.output(cache.clean_frame(args.path, args.chunksize) if args.no_cache else cache.load_clean(args.path, chunksize=args.chunksize))
+    with tracer.stage('render_report', df):
+        drawn = render_report(df, args.out, args.workers)
+    print(f'Figures drawn:{len(drawn)} of {len(RENDERERS)}')
+
+
+def _benchmark(args, tracer):
+    from sales_analysis import benchmark
+
+    if args.path:
+        results = benchmark.run_benchmark(args.path, args.stages)
+        source = args.path
+    else:
+        results = benchmark.benchmark_sizes([int(float(rows)) for rows in args.rows], args.stages, args.seed, args.data_dir)
+        source = f'synthetic(seed={args.seed})'
+    benchmark.write_results(results, args.out, source)
+    for result in results:
+        print(
+            f"{result.get('input_rows', ''):>11} {result['stage']:<36}{result['seconds']:>10.3f}s"
+            f"{result['rows_per_s'] or 0:>14,.0f} rows/s{result['peak_rss_mb']:>10.1f} MB"
+        )
+    print(f'Results appended to {args.out}')
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='python -m sales_analysis', description='Product sales analysis.')
+    parser.add_argument('--trace', help='record each stage of the command to this file')
+    parser.add_argument('--trace-format', choices=['jsonl', 'chrome'], default='jsonl')
+    parser.add_argument('--profile', action='store_true', help='also run each stage under cProfile')
+    parser.add_argument('--trace-memory', choices=['rss', 'tracemalloc'], default='rss', help='how peak memory is measured')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    clean = commands.add_parser('clean', help='clean an export chunk by chunk')
+    clean.add_argument('path', help='raw export, e.g. product_sales.csv')
+    clean.add_argument('--out', default='product_sales_clean.csv', help='where to write the cleaned csv')
+    clean.add_argument('--cache', action='store_true', help='build the Arrow cache instead of writing a csv')
+    clean.add_argument('--cache-dir', default='.sales_cache')
+    clean.add_argument('--chunksize', type=int, default=CHUNKSIZE)
+    clean.set_defaults(run=_clean)
+
+    kpis = commands.add_parser('kpis', help='AOV, weekly and state KPIs, no charts')
+    kpis.add_argument('source', help="export, directory or glob such as 'exports/*.csv'")
+    kpis.add_argument('--workers', type=int, default=None, help='processes to use (default: all cores)')
+    kpis.add_argument('--chunksize', type=int, default=CHUNKSIZE)
+    kpis.add_argument('--n', type=int, default=10, help='states per ranking')
+    kpis.set_defaults(run=_kpis)
+
+    report = commands.add_parser('report', help='render the report figures to files')
+    report.add_argument('path', help='raw export, e.g. product_sales.csv')
+    report.add_argument('--out', default='report', help='directory for the figures')
+    report.add_argument('--workers', type=int, default=None, help='processes to use (default: all cores)')
+    report.add_argument('--no-cache', action='store_true', help='clean the export without the Arrow cache')
+    report.add_argument('--chunksize', type=int, default=CHUNKSIZE)
+    report.set_defaults(run=_report)
+
+    benchmark = commands.add_parser('benchmark', help='time each stage of the analysis')
+    benchmark.add_argument('path', nargs='?', help='export to benchmark; synthetic exports of --rows rows if omitted')
+    benchmark.add_argument('--rows', nargs='+', default=['1e4', '1e5', '1e6'], help='synthetic export sizes, 1e4 to 1e8')
+    benchmark.add_argument('--stages', nargs='+', default=None, help='stages to report (default: all)')
+    benchmark.add_argument('--out', default='benchmarks.jsonl', help='JSON lines file the results are appended to')
+    benchmark.add_argument('--seed', type=int, default=0)
+    benchmark.add_argument('--data-dir', default=None, help='keep (and reuse) the synthetic exports here')
+    benchmark.set_defaults(run=_benchmark)
+    return parser
+
+
+def main(argv=None):
+    from sales_analysis.profiling import Tracer
+
+    args = build_parser().parse_args(argv)
+    with Tracer(args.trace, args.trace_format, args.profile, args.trace_memory) as tracer:
+        args.run(args, tracer)
@@ -0,0 +1,89 @@
+"""Analysis of many export files across a process pool.
+
+Each file is one partition. A worker streams its file through the cleaning
+rules and returns two small mergeable results: the KPI cube (with revenue
+gaps still open) and the (state, revenue) value counts. The parent merges
+the counts into the global state medians, closes the revenue gaps in the
+merged cube and derives the usual KPI tables, so the output is the same as
+cleaning and aggregating all the files as one.
+"""
+import glob
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from sales_analysis import aggregates
+from sales_analysis.cleaning import SALES_METHODS
+from sales_analysis.streaming import (
+    CHUNKSIZE,
+    iter_clean_chunks,
+    medians_from_counts,
+    merge_revenue_counts,
+    revenue_counts,
+)
+
+
+def expand_inputs(source):
+    """Export files for a directory, glob pattern or single path."""
+    if os.path.isdir(source):
+        paths = glob.glob(os.path.join(source, '*.csv'))
+    else:
+        paths = glob.glob(source)
+    if not paths:
+        raise FileNotFoundError(f'No input files match {source!r}')
+    return sorted(paths)
+
+
+def partition_aggregates(path, chunksize=CHUNKSIZE, current_year=None):
+    """Unfilled KPI cube and revenue value counts for one file."""
+    cube = None
+    counts = None
+    for chunk in iter_clean_chunks(path, chunksize, current_year):
+        cube = aggregates.merge_aggregates([cube, aggregates.partial_aggregates(chunk)])
+        counts = merge_revenue_counts([counts, revenue_counts(chunk)])
+    return cube, counts
+
+
+def analyse_files(source, workers=None, chunksize=CHUNKSIZE, current_year=None):
+    """Merged KPI cube for every export matching `source`."""
+    paths = expand_inputs(source)
+    task = partial(partition_aggregates, chunksize=chunksize, current_year=current_year)
+    if len(paths) == 1 or workers == 1:
+        #not worth starting a pool for
+        results = [task(path) for path in paths]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(task, paths))
+    cube = aggregates.merge_aggregates([cube for cube, _ in results])
+    if cube is None:
+        return None
+    state_medians = medians_from_counts(merge_revenue_counts([counts for _, counts in results]))
+    return aggregates.fill_missing_revenue(cube, state_medians)
+
+
+def kpi_tables(cube, n=10):
+    """The KPI tables ``product_sales.py`` reports, keyed by name."""
+    tables = {
+        'AOV': aggregates.average_order_value(cube).to_frame(),
+        'sales_per_week': aggregates.sales_per_week(cube),
+        'avg_sales_per_week': aggregates.avg_sales_per_week(cube),
+    }
+    for metric in aggregates.METRICS:
+        tables[f'top_states_{metric}'] = aggregates.top_states(cube, metric, n)
+    for method in SALES_METHODS:
+        tables[f'top_states_revenue_{method}'] = aggregates.top_states(cube, 'revenue', n, method)
+    return tables
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='KPIs for a directory or glob of product sales exports.')
+    parser.add_argument('source', help="directory, glob such as 'exports/*.csv', or single file")
+    parser.add_argument('--workers', type=int, default=None, help='processes to use (default: all cores)')
+    parser.add_argument('--chunksize', type=int, default=CHUNKSIZE)
+    args = parser.parse_args()
+    cube = analyse_files(args.source, args.workers, args.chunksize)
+    for name, table in kpi_tables(cube).items():
+        print(f'\n{name}')
+        print(table.to_string())
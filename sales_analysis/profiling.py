@@ -0,0 +1,183 @@
+"""Stage-level instrumentation for the analysis pipeline.
+
+Wrap each step in ``with tracer.stage(name, df):`` to record its wall and
+CPU time, peak memory, rows in and out and the deep memory usage of the
+frames it reads and produces. Records go to a JSON lines file (one line per
+stage, written as soon as the stage ends) or a Chrome trace file that
+chrome://tracing and Perfetto can open. With ``profile=True`` each stage
+also runs under cProfile; its stats are dumped next to the trace and the
+top functions are kept in the record.
+
+Peak memory is the peak RSS by default (reset per stage on Linux). With
+``memory='tracemalloc'`` it is the peak of Python-tracked allocations,
+which includes numpy and pandas buffers but slows the pipeline down.
+Stages are meant to follow one another, not nest.
+"""
+import cProfile
+import io
+import json
+import os
+import pstats
+import re
+import sys
+import time
+from contextlib import contextmanager
+
+PROFILE_TOP = 15
+
+
+def reset_peak_rss():
+    """Restart the peak RSS count if the OS allows it (Linux)."""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss_mb():
+    """Peak resident memory since the last reset, or of the whole process."""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    #kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+
+
+def _rows(obj):
+    try:
+        return len(obj)
+    except TypeError:
+        return None
+
+
+def _memory_mb(obj):
+    #frames and series only; deep so string columns count their contents
+    if not hasattr(obj, 'memory_usage'):
+        return None
+    usage = obj.memory_usage(deep=True)
+    if hasattr(obj, 'columns'):
+        usage = usage.sum()
+    return float(usage) / 2 ** 20
+
+
+class Span:
+    """Handle for the stage being recorded; `output` names what it produced."""
+
+    def __init__(self, data):
+        self.data = data
+        self.out = None
+
+    def output(self, out):
+        self.out = out
+        return out
+
+
+class Tracer:
+    """Records stages to `path`; with no path every stage is a no-op."""
+
+    def __init__(self, path=None, fmt='jsonl', profile=False, memory='rss'):
+        if fmt not in ('jsonl', 'chrome'):
+            raise ValueError(f"Unknown trace format {fmt!r}, expected 'jsonl' or 'chrome'")
+        if memory not in ('rss', 'tracemalloc'):
+            raise ValueError(f"Unknown memory measure {memory!r}, expected 'rss' or 'tracemalloc'")
+        self.path = path
+        self.fmt = fmt
+        self.profile = profile
+        self.memory = memory
+        self.records = []
+        self._origin = time.perf_counter()
+        if path is not None and fmt == 'jsonl':
+            #start a fresh file, records are appended as stages end
+            open(path, 'w').close()
+        if path is not None and memory == 'tracemalloc':
+            import tracemalloc
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+
+    @contextmanager
+    def stage(self, name, data=None):
+        """Record the block as stage `name`, reading `data` (usually a frame)."""
+        span = Span(data)
+        if self.path is None:
+            yield span
+            return
+
+        record = {'stage': name, 'rows_in': _rows(data), 'memory_in_mb': _memory_mb(data)}
+        if self.memory == 'tracemalloc':
+            import tracemalloc
+            tracemalloc.reset_peak()
+            start_traced = tracemalloc.get_traced_memory()[0]
+        else:
+            peak_is_stage = reset_peak_rss()
+        profiler = cProfile.Profile() if self.profile else None
+
+        start_cpu = time.process_time()
+        start = time.perf_counter()
+        if profiler is not None:
+            profiler.enable()
+        try:
+            yield span
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            end = time.perf_counter()
+            record['wall_seconds'] = end - start
+            record['cpu_seconds'] = time.process_time() - start_cpu
+            record['start_seconds'] = start - self._origin
+            if self.memory == 'tracemalloc':
+                record['peak_alloc_mb'] = (tracemalloc.get_traced_memory()[1] - start_traced) / 2 ** 20
+            else:
+                record['peak_rss_mb'] = peak_rss_mb()
+                record['peak_rss_is_stage'] = peak_is_stage
+            #a stage that works in place produces its input
+            out = span.out if span.out is not None else span.data
+            record['rows_out'] = _rows(out)
+            record['memory_out_mb'] = _memory_mb(out)
+            if profiler is not None:
+                record.update(self._profile_stats(name, profiler))
+            self._emit(record)
+
+    def _profile_stats(self, name, profiler):
+        stats_path = f'{self.path}.{len(self.records)}-{re.sub(r"[^A-Za-z0-9_.-]+", "_", name)}.prof'
+        profiler.dump_stats(stats_path)
+        text = io.StringIO()
+        pstats.Stats(profiler, stream=text).sort_stats('cumulative').print_stats(PROFILE_TOP)
+        top = [line.strip() for line in text.getvalue().splitlines() if re.match(r'\s*\d', line) and 'function calls' not in line]
+        return {'profile': stats_path, 'profile_top': top}
+
+    def _emit(self, record):
+        self.records.append(record)
+        if self.fmt == 'jsonl':
+            with open(self.path, 'a') as f:
+                f.write(json.dumps(record) + '\n')
+
+    def close(self):
+        """Write the Chrome trace; JSON lines are already on disk."""
+        if self.path is None or self.fmt != 'chrome':
+            return
+        events = [{
+            'name': record['stage'],
+            'ph': 'X',
+            'ts': record['start_seconds'] * 1e6,
+            'dur': record['wall_seconds'] * 1e6,
+            'pid': os.getpid(),
+            'tid': 0,
+            'args': {key: value for key, value in record.items() if key not in ('stage', 'start_seconds')},
+        } for record in self.records]
+        with open(self.path, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,339 @@
+"""Headless rendering of the report figures.
+
+The figures from ``product_sales.py`` are drawn from small, pre-computed
+inputs instead of the raw rows: binned counts for the histograms, box
+statistics for the boxplot, a capped sample for the pairplot and the KPI
+cube for everything else. Those inputs are cheap to hash, so a figure whose
+input and renderer haven't changed since the last run is not drawn again,
+and the rest are drawn in parallel worker processes on the Agg backend.
+"""
+import hashlib
+import inspect
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from sales_analysis import aggregates, stats
+from sales_analysis.cleaning import SALES_METHODS
+
+REPORT_DIR = 'report'
+MANIFEST = 'manifest.json'
+##bump when a change outside the renderers (e.g. a shared helper) alters the figures
+RENDERER_VERSION = 1
+
+HIST_BINS = 30
+PAIRPLOT_SAMPLE = 5000
+MAX_FLIERS = 1000
+
+
+##inputs for each figure, computed once in the parent process
+
+def _binned_revenue(revenue, edges):
+    counts, _ = np.histogram(revenue.dropna(), bins=edges)
+    return counts
+
+
+def _box_stats(revenue, label, seed=0):
+    revenue = revenue.dropna()
+    q1, median, q3 = revenue.quantile([0.25, 0.5, 0.75])
+    iqr = q3 - q1
+    inside = revenue.between(q1 - 1.5 * iqr, q3 + 1.5 * iqr)
+    fliers = revenue[~inside]
+    if len(fliers) > MAX_FLIERS:
+        fliers = fliers.sample(MAX_FLIERS, random_state=seed)
+    return {
+        'label': label, 'q1': q1, 'med': median, 'q3': q3,
+        'whislo': revenue[inside].min(), 'whishi': revenue[inside].max(),
+        'fliers': fliers.to_numpy(),
+    }
+
+
+def figure_inputs(df, cube=None, seed=0):
+    """Input data for every figure, keyed by figure name."""
+    if cube is None:
+        cube = aggregates.partial_aggregates(df)
+    edges = np.histogram_bin_edges(df['revenue'].dropna(), bins=HIST_BINS)
+    by_method = dict(tuple(df.groupby('sales_method', observed=True)['revenue']))
+    numeric = df.select_dtypes('number')
+    sample = numeric.sample(min(len(numeric), PAIRPLOT_SAMPLE), random_state=seed)
+    return {
+        'sales_method_frequency': cube.groupby('sales_method', observed=True)['n'].sum(),
+        'revenue_distribution': (edges, _binned_revenue(df['revenue'], edges)),
+        'revenue_distribution_by_method': {
+            method: (edges, _binned_revenue(by_method[method], edges))
+            for method in SALES_METHODS if method in by_method
+        },
+        'revenue_boxplot': [_box_stats(by_method[method], method, seed) for method in SALES_METHODS if method in by_method],
+        'pairplot': sample.reset_index(drop=True),
+        'correlation': numeric.corr(),
+        'avg_site_visits': aggregates.avg_site_visits(cube),
+        'revenue_over_time': stats.group_stats(cube, ['week', 'sales_method'], 'revenue'),
+        'sales_per_week': (aggregates.sales_per_week(cube), aggregates.avg_sales_per_week(cube)),
+        'top_ten_states': {metric: aggregates.top_states(cube, metric) for metric in aggregates.METRICS},
+        'top_ten_states_per_method': {method: aggregates.top_states(cube, 'revenue', 10, method) for method in SALES_METHODS},
+    }
+
+
+##renderers, run in the workers
+
+def _sales_method_frequency(plt, sns, counts):
+    fig, ax = plt.subplots()
+    ax.bar(counts.index.astype(str), counts.values)
+    ax.set_xlabel('Sales method')
+    ax.set_ylabel('Frequency')
+    ax.set_title('Frequency of Sales Methods')
+    return fig
+
+
+def _revenue_distribution(plt, sns, binned):
+    edges, counts = binned
+    fig, ax = plt.subplots()
+    ax.hist(edges[:-1], bins=edges, weights=counts)
+    ax.set_xlabel('revenue')
+    ax.set_ylabel('Count')
+    ax.set_title('Distribution of Revenue')
+    return fig
+
+
+def _revenue_distribution_by_method(plt, sns, binned):
+    fig, ax = plt.subplots(ncols=len(binned), figsize=(12, 5), squeeze=False)
+    for i, (method, (edges, counts)) in enumerate(binned.items()):
+        ax[0, i].hist(edges[:-1], bins=edges, weights=counts)
+        ax[0, i].set_xlabel('revenue')
+        ax[0, i].set_title(f'Distribution for {method}  method')
+    ax[0, 0].set_ylabel('Count')
+    fig.suptitle('Distribution of Revenue by the Sales Methods')
+    fig.tight_layout()
+    return fig
+
+
+def _revenue_boxplot(plt, sns, box_stats):
+    fig, ax = plt.subplots()
+    ax.bxp(box_stats)
+    ax.set_xlabel('Sales Method')
+    ax.set_ylabel('Revenue')
+    ax.set_title('Distribution of Revenue by Sales Method')
+    return fig
+
+
+def _pairplot(plt, sns, sample):
+    return sns.pairplot(sample).figure
+
+
+def _correlation(plt, sns, corr):
+    fig, ax = plt.subplots()
+    sns.heatmap(corr, ax=ax)
+    return fig
+
+
+def _avg_site_visits(plt, sns, table):
+    fig, ax = plt.subplots()
+    sns.barplot(y='sales_method', x='nb_site_visits', data=table, orient='horizontal', errorbar=None, ax=ax)
+    ax.set_xlabel('Average number of site visits')
+    ax.set_ylabel('Sales method')
+    ax.set_title('Average number of site visits')
+    return fig
+
+
+def _revenue_over_time(plt, sns, table):
+    fig, ax = plt.subplots(ncols=2, figsize=(12, 5))
+    stats.lineplot_ci(ax[0], table, 'week', 'mean', 'sales_method')
+    stats.lineplot_ci(ax[1], table, 'week', 'sum', 'sales_method')
+    fig.suptitle('Analysis of Revenue over Time')
+    ax[0].set_title('Mean Revenue over Time')
+    ax[1].set_title('Total Revenue over Time')
+    for axis in ax:
+        axis.set_ylabel('revenue')
+        weeks = sorted(table['week'].unique())
+        axis.set_xticks(weeks)
+        axis.set_xticklabels([f'week {week}' for week in weeks], rotation=45)
+    fig.tight_layout()
+    return fig
+
+
+def _sales_per_week(plt, sns, tables):
+    totals, means = tables
+    fig, ax = plt.subplots(nrows=2, ncols=2, figsize=(12, 7))
+    panels = [
+        (ax[0, 0], totals, 'nb_sold', 'Sales Method with highest total sales per week', 'Number of items sold'),
+        (ax[0, 1], totals, 'revenue', 'Sales Method with highest total revenue per week', 'Revenue'),
+        (ax[1, 0], means, 'nb_sold', 'Sales Method with highest average sales per week', 'Number of items sold'),
+        (ax[1, 1], means, 'revenue', 'Sales Method with highest average revenue per week', 'Revenue'),
+    ]
+    for axis, table, metric, title, xlabel in panels:
+        sns.barplot(y='week', x=metric, hue='sales_method', data=table, orient='horizontal', errorbar=None, ax=axis)
+        axis.set_title(title)
+        axis.set_ylabel('Week')
+        #seaborn puts the bars of the weeks present at 0..k-1
+        weeks = sorted(table['week'].unique())
+        axis.set_yticks(range(len(weeks)))
+        axis.set_yticklabels([f'week {week}' for week in weeks])
+        axis.set_xlabel(xlabel)
+    fig.tight_layout()
+    return fig
+
+
+def _top_ten_states(plt, sns, tables):
+    labels = {
+        'revenue': ('Total revenue', 'Revenue'),
+        'nb_sold': ('Total number of items sold', 'Number of items sold'),
+        'years_as_customer': ('Total number of years as Customer', 'Number of years as Customer'),
+        'nb_site_visits': ('Total number of site visits', 'Number of site visits'),
+    }
+    fig, ax = plt.subplots(ncols=len(tables), figsize=(12, 5))
+    for axis, (metric, table) in zip(ax, tables.items()):
+        sns.barplot(y='state', x=metric, data=table, orient='horizontal', errorbar=None, ax=axis)
+        axis.set_title(labels[metric][0])
+        axis.set_ylabel('State')
+        axis.set_xlabel(labels[metric][1])
+    fig.suptitle('Top ten states in total revenue, number of items sold and number of years as customer ')
+    fig.tight_layout()
+    return fig
+
+
+def _top_ten_states_per_method(plt, sns, tables):
+    titles = {
+        'Email': 'Top ten states by Email method',
+        'Call': 'Top ten states by Call method',
+        'Email + Call': 'Top ten states by Email and Call method',
+    }
+    fig, ax = plt.subplots(ncols=len(tables), figsize=(12, 5))
+    for axis, (method, table) in zip(ax, tables.items()):
+        sns.barplot(x='revenue', y='state', data=table, errorbar=None, ax=axis)
+        axis.set_title(titles[method])
+    fig.suptitle('Top ten states in total revenue per sales method')
+    fig.tight_layout()
+    return fig
+
+
+RENDERERS = {
+    'sales_method_frequency': _sales_method_frequency,
+    'revenue_distribution': _revenue_distribution,
+    'revenue_distribution_by_method': _revenue_distribution_by_method,
+    'revenue_boxplot': _revenue_boxplot,
+    'pairplot': _pairplot,
+    'correlation': _correlation,
+    'avg_site_visits': _avg_site_visits,
+    'revenue_over_time': _revenue_over_time,
+    'sales_per_week': _sales_per_week,
+    'top_ten_states': _top_ten_states,
+    'top_ten_states_per_method': _top_ten_states_per_method,
+}
+
+
+def render_figure(name, data, out_path):
+    """Draw figure `name` from `data` into `out_path` on the Agg backend."""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    fig = RENDERERS[name](plt, sns, data)
+    fig.savefig(out_path)
+    plt.close(fig)
+    return out_path
+
+
+def _hash_into(digest, data):
+    #hash values, not memory layout, so the same data from the cache or a fresh clean matches
+    if isinstance(data, pd.DataFrame):
+        digest.update(json.dumps([str(column) for column in data.columns]).encode())
+        digest.update(pd.util.hash_pandas_object(data, index=True).to_numpy().tobytes())
+    elif isinstance(data, pd.Series):
+        digest.update(str(data.name).encode())
+        digest.update(pd.util.hash_pandas_object(data, index=True).to_numpy().tobytes())
+    elif isinstance(data, np.ndarray):
+        digest.update(str(data.shape).encode())
+        digest.update(pd.util.hash_array(data.ravel()).tobytes())
+    elif isinstance(data, dict):
+        for key in sorted(data, key=str):
+            digest.update(str(key).encode())
+            _hash_into(digest, data[key])
+    elif isinstance(data, (list, tuple)):
+        digest.update(f'{type(data).__name__}{len(data)}'.encode())
+        for item in data:
+            _hash_into(digest, item)
+    else:
+        digest.update(repr(data).encode())
+
+
+def _renderer_source(name):
+    renderer = RENDERERS[name]
+    try:
+        return inspect.getsource(renderer)
+    except OSError:
+        return repr(renderer.__code__.co_code)
+
+
+def _fingerprint(name, data):
+    """Hash of figure `name`'s input and of the code that draws it."""
+    digest = hashlib.sha256()
+    digest.update(f'{RENDERER_VERSION}{_renderer_source(name)}'.encode())
+    _hash_into(digest, data)
+    return digest.hexdigest()
+
+
+def _write_manifest(out_dir, manifest):
+    with open(os.path.join(out_dir, MANIFEST), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+
+
+def _read_manifest(out_dir):
+    try:
+        with open(os.path.join(out_dir, MANIFEST)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def render_report(df, out_dir=REPORT_DIR, workers=None, cube=None, seed=0):
+    """Render every figure for the cleaned frame `df` into `out_dir`.
+
+    Returns the names of the figures that were drawn; the others were
+    unchanged since the last run and left as they are.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    inputs = figure_inputs(df, cube, seed)
+    manifest = _read_manifest(out_dir)
+    stale = {}
+    for name, data in inputs.items():
+        fingerprint = _fingerprint(name, data)
+        out_path = os.path.join(out_dir, f'{name}.png')
+        if manifest.get(name) != fingerprint or not os.path.exists(out_path):
+            stale[name] = (data, out_path, fingerprint)
+
+    if stale:
+        errors = []
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {name: pool.submit(render_figure, name, data, out_path) for name, (data, out_path, _) in stale.items()}
+            for name, future in futures.items():
+                try:
+                    future.result()
+                except Exception as error:
+                    errors.append(error)
+                else:
+                    manifest[name] = stale[name][2]
+        #record the figures that did render, so a failure doesn't redraw them next run
+        _write_manifest(out_dir, manifest)
+        if errors:
+            raise errors[0]
+    return list(stale)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    from sales_analysis import cache
+
+    parser = argparse.ArgumentParser(description='Render the report figures for an export without a display.')
+    parser.add_argument('path', help='raw export, e.g. product_sales.csv')
+    parser.add_argument('--out', default=REPORT_DIR, help='directory for the figures')
+    parser.add_argument('--workers', type=int, default=None, help='processes to use (default: all cores)')
+    parser.add_argument('--no-cache', action='store_true', help='clean the export without the Arrow cache')
+    args = parser.parse_args()
+    df = cache.clean_frame(args.path) if args.no_cache else cache.load_clean(args.path)
+    drawn = render_report(df, args.out, args.workers)
+    print(f'Figures drawn:{len(drawn)} of {len(RENDERERS)}')
@@ -0,0 +1,227 @@
+"""Mergeable sketches for the state rankings and the revenue distribution.
+
+An alternative to `aggregates` for data that doesn't fit in memory:
+
+- `TopK` keeps the heaviest `capacity` items per group (SpaceSaving style),
+  with an upper bound on how much each estimate can overstate the total.
+- `QuantileSketch` buckets values on a logarithmic scale (DDSketch style);
+  every quantile it returns is within `relative_accuracy` of the true one.
+
+Both update from whole chunks with a single groupby and merge by addition,
+so partitions sketched in different processes can be combined, as long as
+every partition fills missing revenue with the same (global) state medians;
+`sketch_files` takes care of that. `SalesSketches` bundles sketches for the
+state rankings and revenue distributions of ``product_sales.py`` for
+``python -m sales_analysis.sketches``; the report draws from exact tables.
+"""
+import math
+
+import numpy as np
+import pandas as pd
+
+from sales_analysis.aggregates import METRICS
+from sales_analysis.parallel import expand_inputs
+from sales_analysis.streaming import (
+    CHUNKSIZE, iter_clean_chunks, iter_cleaned, medians_from_counts, merge_revenue_counts, revenue_counts,
+)
+
+ALL = '(all)'
+
+
+class TopK:
+    """Heaviest items per group by total weight.
+
+    `count` is an upper bound on an item's total and ``count - error`` a
+    lower bound; an item that is not kept totals at most the group's
+    `floor`. With no more distinct items than `capacity` it is exact; the
+    default covers every US state, so only finer keys are approximated.
+    """
+
+    def __init__(self, capacity=64):
+        self.capacity = capacity
+        self.counters = pd.DataFrame(
+            {'count': pd.Series(dtype='float64'), 'error': pd.Series(dtype='float64')},
+            index=pd.MultiIndex.from_arrays([[], []], names=['group', 'item']),
+        )
+        self.floor = pd.Series(dtype='float64')
+
+    def update(self, items, weights, groups=ALL):
+        """Add `weights` for `items` (array-likes of one chunk)."""
+        totals = pd.Series(np.asarray(weights, dtype='float64')).groupby(
+            [np.broadcast_to(np.asarray(groups, dtype=object), len(items)), np.asarray(items)]
+        ).sum()
+        totals.index.names = ['group', 'item']
+        chunk = TopK(self.capacity)
+        chunk.counters = pd.DataFrame({'count': totals, 'error': 0.0})
+        self.merge(chunk)
+
+    def merge(self, other):
+        """Fold `other` into this sketch."""
+        index = self.counters.index.union(other.counters.index)
+        groups = index.get_level_values('group')
+        own_floor = self.floor.reindex(groups, fill_value=0).to_numpy()
+        other_floor = other.floor.reindex(groups, fill_value=0).to_numpy()
+        own = self.counters.reindex(index)
+        theirs = other.counters.reindex(index)
+        #an item missing from one side may have been dropped there with up to that side's floor
+        merged = pd.DataFrame({
+            'count': own['count'].fillna(pd.Series(own_floor, index=index)) + theirs['count'].fillna(pd.Series(other_floor, index=index)),
+            'error': own['error'].fillna(pd.Series(own_floor, index=index)) + theirs['error'].fillna(pd.Series(other_floor, index=index)),
+        }, index=index)
+        floor = self.floor.add(other.floor, fill_value=0)
+
+        merged = merged.sort_values('count', ascending=False)
+        rank = merged.groupby(level='group').cumcount()
+        dropped = merged[rank >= self.capacity]
+        self.counters = merged[rank < self.capacity]
+        if len(dropped):
+            floor = floor.combine(dropped.groupby(level='group')['count'].max(), max, fill_value=0)
+        self.floor = floor
+        return self
+
+    def top(self, n=10, group=ALL):
+        """The `n` heaviest items of `group` with their estimate and error bound."""
+        if group not in self.counters.index.get_level_values('group'):
+            return pd.DataFrame(columns=['item', 'count', 'error'])
+        counters = self.counters.xs(group, level='group').sort_values('count', ascending=False)
+        return counters[:n].rename_axis('item').reset_index()
+
+
+class QuantileSketch:
+    """Quantiles per group with relative error `relative_accuracy`.
+
+    Meant for non-negative values; zero and below share one bucket.
+    """
+
+    def __init__(self, relative_accuracy=0.01):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.counts = pd.Series(
+            dtype='float64', index=pd.MultiIndex.from_arrays([[], []], names=['group', 'bucket'])
+        )
+
+    def update(self, values, groups=ALL):
+        """Add the non-missing `values` of one chunk."""
+        values = np.asarray(values, dtype='float64')
+        groups = np.broadcast_to(np.asarray(groups, dtype=object), len(values))
+        present = ~np.isnan(values)
+        values, groups = values[present], groups[present]
+        with np.errstate(divide='ignore'):
+            buckets = np.ceil(np.log(values) / math.log(self.gamma))
+        #zero and below get their own bucket under every positive one
+        buckets = np.where(values > 0, buckets, np.iinfo('int32').min).astype('int64')
+        counts = pd.Series(1.0, index=pd.MultiIndex.from_arrays([groups, buckets], names=['group', 'bucket']))
+        self.counts = self.counts.add(counts.groupby(level=[0, 1]).sum(), fill_value=0)
+
+    def merge(self, other):
+        """Fold `other` (same `relative_accuracy`) into this sketch."""
+        self.counts = self.counts.add(other.counts, fill_value=0)
+        return self
+
+    def quantiles(self, q=(0.25, 0.5, 0.75)):
+        """One row per group, one column per quantile in `q`."""
+        rows = {}
+        for group, counts in self.counts.groupby(level='group'):
+            buckets = counts.index.get_level_values('bucket').to_numpy()
+            order = np.argsort(buckets)
+            buckets = buckets[order]
+            cumulative = np.cumsum(counts.to_numpy()[order])
+            ranks = np.asarray(q) * (cumulative[-1] - 1)
+            chosen = buckets[np.searchsorted(cumulative, ranks, side='right')]
+            #midpoint of the bucket in relative terms
+            values = np.where(
+                chosen == np.iinfo('int32').min, 0.0, 2 * self.gamma ** chosen.astype('float64') / (self.gamma + 1)
+            )
+            rows[group] = values
+        table = pd.DataFrame.from_dict(rows, orient='index', columns=list(q))
+        table['relative_error'] = self.relative_accuracy
+        return table
+
+
+class SalesSketches:
+    """Top states per metric and revenue quantiles, overall and per method."""
+
+    def __init__(self, capacity=64, relative_accuracy=0.01):
+        self.top_states = {metric: TopK(capacity) for metric in METRICS}
+        self.revenue_by_method = QuantileSketch(relative_accuracy)
+        self.revenue_by_state = QuantileSketch(relative_accuracy)
+
+    def update(self, chunk):
+        states = chunk['state'].astype(str).to_numpy()
+        methods = chunk['sales_method'].astype(str).to_numpy()
+        for metric, sketch in self.top_states.items():
+            sketch.update(states, chunk[metric].fillna(0).to_numpy(), ALL)
+            sketch.update(states, chunk[metric].fillna(0).to_numpy(), methods)
+        self.revenue_by_method.update(chunk['revenue'].to_numpy(), methods)
+        self.revenue_by_method.update(chunk['revenue'].to_numpy(), ALL)
+        self.revenue_by_state.update(chunk['revenue'].to_numpy(), states)
+        return self
+
+    def merge(self, other):
+        for metric, sketch in self.top_states.items():
+            sketch.merge(other.top_states[metric])
+        self.revenue_by_method.merge(other.revenue_by_method)
+        self.revenue_by_state.merge(other.revenue_by_state)
+        return self
+
+    def top_ten_states(self, metric='revenue', sales_method=None, n=10):
+        """Top `n` states by total `metric`, with the estimate's error bound."""
+        top = self.top_states[metric].top(n, ALL if sales_method is None else sales_method)
+        return top.rename(columns={'item': 'state', 'count': metric})
+
+    def revenue_quantiles(self, by='sales_method', q=(0.25, 0.5, 0.75)):
+        sketch = self.revenue_by_method if by == 'sales_method' else self.revenue_by_state
+        return sketch.quantiles(q).rename_axis(by)
+
+
+def sketch_chunks(chunks, capacity=64, relative_accuracy=0.01):
+    """`SalesSketches` for an iterable of cleaned chunks."""
+    sketches = SalesSketches(capacity, relative_accuracy)
+    for chunk in chunks:
+        sketches.update(chunk)
+    return sketches
+
+
+def sketch_csv(path, chunksize=CHUNKSIZE, capacity=64, relative_accuracy=0.01, state_medians=None):
+    """`SalesSketches` for an export, cleaned chunk by chunk.
+
+    Revenue gaps are filled with `state_medians`, or the export's own
+    medians if not given; pass global medians when the result is merged
+    with other partitions.
+    """
+    return sketch_chunks(iter_cleaned(path, chunksize, state_medians=state_medians), capacity, relative_accuracy)
+
+
+def sketch_files(source, chunksize=CHUNKSIZE, capacity=64, relative_accuracy=0.01):
+    """Merged `SalesSketches` for every export matching `source`.
+
+    A first pass finds the state medians over all the files, so the merged
+    sketches match sketching the files as a single export.
+    """
+    paths = expand_inputs(source)
+    counts = None
+    for path in paths:
+        for chunk in iter_clean_chunks(path, chunksize):
+            counts = merge_revenue_counts([counts, revenue_counts(chunk)])
+    state_medians = medians_from_counts(counts)
+    sketches = SalesSketches(capacity, relative_accuracy)
+    for path in paths:
+        sketches.merge(sketch_csv(path, chunksize, capacity, relative_accuracy, state_medians))
+    return sketches
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Approximate state rankings and revenue quantiles for an export.')
+    parser.add_argument('source', help="export, directory or glob such as 'exports/*.csv'")
+    parser.add_argument('--chunksize', type=int, default=CHUNKSIZE)
+    parser.add_argument('--capacity', type=int, default=64, help='states kept per ranking')
+    parser.add_argument('--relative-accuracy', type=float, default=0.01)
+    args = parser.parse_args()
+    sketches = sketch_files(args.source, args.chunksize, args.capacity, args.relative_accuracy)
+    for metric in METRICS:
+        print(f'\nTop ten states by {metric}')
+        print(sketches.top_ten_states(metric).to_string(index=False))
+    print('\nRevenue quantiles by sales method')
+    print(sketches.revenue_quantiles().to_string())
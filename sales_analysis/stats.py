@@ -0,0 +1,49 @@
+"""Closed-form group statistics for the revenue-over-time charts.
+
+seaborn's default confidence interval bootstraps the raw rows a thousand
+times per group. The mean and the sum of a group have normal-approximation
+intervals that only need the group's count, sum and sum of squares, which
+the KPI cube already holds, so the charts are drawn from a table with one
+row per point whatever the number of rows behind it.
+"""
+from statistics import NormalDist
+
+import numpy as np
+
+CONFIDENCE = 0.95
+
+
+def group_stats(cube, by, metric, confidence=CONFIDENCE):
+    """Count, mean, sum and their confidence intervals for `metric` per `by`.
+
+    Uses the sample standard deviation from the sums of squares and a normal
+    critical value, so a group of one row gets no interval (NaN).
+    """
+    grouped = cube.groupby(by, observed=True)[[f'{metric}_count', f'{metric}_sum', f'{metric}_sq_sum']].sum()
+    n = grouped[f'{metric}_count'].astype('float64')
+    total = grouped[f'{metric}_sum']
+    mean = total / n
+    #clip: rounding can push the variance of a constant group just below zero
+    variance = ((grouped[f'{metric}_sq_sum'] - n * mean ** 2) / (n - 1)).clip(lower=0)
+    std = np.sqrt(variance.where(n > 1))
+    z = NormalDist().inv_cdf((1 + confidence) / 2)
+    mean_margin = z * std / np.sqrt(n)
+    sum_margin = z * std * np.sqrt(n)
+    table = grouped[[]].assign(
+        count=n, mean=mean, mean_low=mean - mean_margin, mean_high=mean + mean_margin,
+        sum=total, sum_low=total - sum_margin, sum_high=total + sum_margin,
+    )
+    return table.reset_index()
+
+
+def lineplot_ci(ax, table, x, y, hue):
+    """Line per `hue` level of `y` against `x`, with its interval as a band.
+
+    `y` is ``'mean'`` or ``'sum'`` from `group_stats`.
+    """
+    for level, group in table.groupby(hue, observed=True):
+        group = group.sort_values(x)
+        line, = ax.plot(group[x], group[y], label=level)
+        ax.fill_between(group[x], group[f'{y}_low'], group[f'{y}_high'], color=line.get_color(), alpha=0.2, linewidth=0)
+    ax.legend(title=hue)
+    return ax
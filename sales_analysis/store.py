@@ -0,0 +1,300 @@
+"""Materialised KPI store in SQLite.
+
+Each export file is a partition. Its KPI cube over (week, sales_method,
+state) is stored with revenue gaps left open, along with its (state,
+revenue) value counts. The cube merged across all partitions and the
+per-state medians that close its gaps are kept materialised; a refresh
+subtracts the old rows of every partition it replaces or drops and adds
+the new ones, so a query only reads the requested slice of the merged
+cube, however long the history.
+
+Refreshing re-reads only the files whose content, cleaning rules or
+founding-year bound changed (files whose size and modification time are
+unchanged are not even hashed), and drops the partitions whose files are
+gone (with ``prune``, every partition outside the refreshed source).
+Dashboards never touch the raw exports.
+"""
+import datetime
+import os
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import pandas as pd
+
+from sales_analysis import aggregates
+from sales_analysis.cache import file_hash
+from sales_analysis.cleaning import CLEANING_VERSION, max_years_as_customer, sales_method_category
+from sales_analysis.parallel import expand_inputs, partition_aggregates
+from sales_analysis.streaming import CHUNKSIZE, medians_from_counts
+
+STORE_PATH = 'kpis.sqlite'
+
+CUBE_COLUMNS = (
+    ['n']
+    + [f'{metric}_sum' for metric in aggregates.METRICS]
+    + [f'{metric}_sq_sum' for metric in aggregates.METRICS]
+    + [f'{metric}_count' for metric in aggregates.METRICS]
+)
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS partitions (
+    partition TEXT PRIMARY KEY,
+    hash TEXT NOT NULL,
+    cleaning_version INTEGER NOT NULL,
+    refreshed_at TEXT NOT NULL,
+    max_years INTEGER,
+    size INTEGER,
+    mtime REAL
+);
+CREATE TABLE IF NOT EXISTS kpi_cube (
+    partition TEXT NOT NULL,
+    week INTEGER NOT NULL,
+    sales_method TEXT NOT NULL,
+    state TEXT NOT NULL,
+    {', '.join(f'{column} REAL NOT NULL' for column in CUBE_COLUMNS)}
+);
+CREATE INDEX IF NOT EXISTS kpi_cube_partition ON kpi_cube (partition);
+DROP INDEX IF EXISTS kpi_cube_slice;
+CREATE TABLE IF NOT EXISTS kpi_totals (
+    week INTEGER NOT NULL,
+    sales_method TEXT NOT NULL,
+    state TEXT NOT NULL,
+    {', '.join(f'{column} REAL NOT NULL' for column in CUBE_COLUMNS)},
+    PRIMARY KEY (week, sales_method, state)
+);
+CREATE TABLE IF NOT EXISTS revenue_counts (
+    partition TEXT NOT NULL,
+    state TEXT NOT NULL,
+    revenue REAL NOT NULL,
+    count INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS revenue_counts_partition ON revenue_counts (partition);
+CREATE TABLE IF NOT EXISTS state_medians (
+    state TEXT PRIMARY KEY,
+    revenue REAL NOT NULL
+);
+"""
+
+
+def connect(path=STORE_PATH):
+    """Open (and if needed create) the store at `path`."""
+    conn = sqlite3.connect(path)
+    conn.executescript(SCHEMA)
+    columns = [row[1] for row in conn.execute('PRAGMA table_info(partitions)')]
+    with conn:
+        #stores from before these were tracked; their partitions are hashed (max_years: re-read) once
+        for column, kind in (('max_years', 'INTEGER'), ('size', 'INTEGER'), ('mtime', 'REAL')):
+            if column not in columns:
+                conn.execute(f'ALTER TABLE partitions ADD COLUMN {column} {kind}')
+        if conn.execute('SELECT 1 FROM kpi_cube LIMIT 1').fetchone() and not conn.execute('SELECT 1 FROM kpi_totals LIMIT 1').fetchone():
+            #stores from before the merged cube was materialised
+            conn.execute(f'INSERT INTO kpi_totals SELECT week, sales_method, state, {_sums()} FROM kpi_cube GROUP BY week, sales_method, state')
+    return conn
+
+
+def _sums():
+    return ', '.join(f'SUM({column})' for column in CUBE_COLUMNS)
+
+
+def _file_stat(path):
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime
+
+
+def _stale_partitions(conn, paths, max_years):
+    """Partitions to re-read, with their hash and stat, and unchanged ones whose stat moved."""
+    stored = {row[0]: row[1:] for row in conn.execute(
+        'SELECT partition, hash, size, mtime FROM partitions WHERE cleaning_version = ? AND max_years = ?',
+        (CLEANING_VERSION, max_years),
+    )}
+    stale, touched = {}, {}
+    for path in paths:
+        partition = os.path.abspath(path)
+        size, mtime = _file_stat(path)
+        digest, stored_size, stored_mtime = stored.get(partition, (None, None, None))
+        if (stored_size, stored_mtime) == (size, mtime):
+            continue
+        #size or mtime changed (or were never recorded): only the content hash can tell
+        new_digest = file_hash(path)
+        if new_digest == digest:
+            touched[partition] = (size, mtime)
+        else:
+            stale[partition] = (new_digest, size, mtime)
+    return stale, touched
+
+
+def _dropped_partitions(conn, partitions, prune):
+    stored = [row[0] for row in conn.execute('SELECT partition FROM partitions')]
+    if prune:
+        return [partition for partition in stored if partition not in partitions]
+    #a moved or renamed export would otherwise be counted under both paths
+    return [partition for partition in stored if not os.path.exists(partition)]
+
+
+def _add_to_totals(conn, partition, sign):
+    """Add (sign=1) or subtract (sign=-1) a stored partition's cube from the merged one."""
+    columns = ', '.join(CUBE_COLUMNS)
+    signed = ', '.join(f'{sign} * {column}' for column in CUBE_COLUMNS)
+    updates = ', '.join(f'{column} = {column} + excluded.{column}' for column in CUBE_COLUMNS)
+    conn.execute(
+        f'INSERT INTO kpi_totals (week, sales_method, state, {columns}) '
+        f'SELECT week, sales_method, state, {signed} FROM kpi_cube WHERE partition = ? '
+        f'ON CONFLICT (week, sales_method, state) DO UPDATE SET {updates}',
+        (partition,),
+    )
+
+
+def _delete_partition(conn, partition):
+    _add_to_totals(conn, partition, -1)
+    for table in ('kpi_cube', 'revenue_counts', 'partitions'):
+        conn.execute(f'DELETE FROM {table} WHERE partition = ?', (partition,))
+
+
+def refresh(conn, source, workers=None, chunksize=CHUNKSIZE, current_year=None, prune=False):
+    """Bring the store up to date with the exports matching `source`.
+
+    Only files that are new or whose content changed are read. Partitions
+    whose file no longer exists are dropped; with `prune`, so is every
+    partition not matching `source`. Returns the refreshed and the dropped
+    partitions.
+    """
+    paths = expand_inputs(source)
+    max_years = max_years_as_customer(current_year)
+    stale, touched = _stale_partitions(conn, paths, max_years)
+    dropped = _dropped_partitions(conn, {os.path.abspath(path) for path in paths}, prune)
+    if touched:
+        with conn:
+            conn.executemany(
+                'UPDATE partitions SET size = ?, mtime = ? WHERE partition = ?',
+                [(size, mtime, partition) for partition, (size, mtime) in touched.items()],
+            )
+    if not stale and not dropped:
+        return [], []
+    results = []
+    if stale:
+        task = partial(partition_aggregates, chunksize=chunksize, current_year=current_year)
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(task, stale))
+
+    refreshed_at = datetime.datetime.now().isoformat(timespec='seconds')
+    with conn:
+        for partition in dropped:
+            _delete_partition(conn, partition)
+        for (partition, (digest, size, mtime)), (cube, counts) in zip(stale.items(), results):
+            _delete_partition(conn, partition)
+            if cube is not None:
+                cube.assign(partition=partition).to_sql('kpi_cube', conn, if_exists='append', index=False)
+                counts.rename('count').reset_index().set_axis(['state', 'revenue', 'count'], axis=1).assign(
+                    partition=partition
+                ).to_sql('revenue_counts', conn, if_exists='append', index=False)
+                _add_to_totals(conn, partition, 1)
+            conn.execute(
+                'INSERT INTO partitions (partition, hash, cleaning_version, refreshed_at, max_years, size, mtime) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (partition, digest, CLEANING_VERSION, refreshed_at, max_years, size, mtime),
+            )
+        #keys whose every partition was subtracted
+        conn.execute('DELETE FROM kpi_totals WHERE n = 0')
+        _refresh_medians(conn)
+    return list(stale), dropped
+
+
+def _refresh_medians(conn):
+    counts = pd.read_sql_query(
+        'SELECT state, revenue, SUM(count) AS count FROM revenue_counts GROUP BY state, revenue', conn
+    ).set_index(['state', 'revenue'])['count']
+    conn.execute('DELETE FROM state_medians')
+    if len(counts):
+        medians_from_counts(counts).reset_index().to_sql('state_medians', conn, if_exists='append', index=False)
+
+
+def _where(filters):
+    clauses, params = [], []
+    for column, value in filters.items():
+        if value is None:
+            continue
+        values = list(value) if isinstance(value, (list, tuple, set)) else [value]
+        clauses.append(f'{column} IN ({", ".join("?" * len(values))})')
+        params.extend(values)
+    return (' WHERE ' + ' AND '.join(clauses)) if clauses else '', params
+
+
+def load_cube(conn, week=None, sales_method=None, state=None):
+    """Merged KPI cube for the requested slice, revenue gaps filled.
+
+    Each filter is a value or a list of values; None keeps everything.
+    """
+    where, params = _where({'week': week, 'sales_method': sales_method, 'state': state})
+    cube = pd.read_sql_query(
+        f'SELECT week, sales_method, state, {", ".join(CUBE_COLUMNS)} FROM kpi_totals{where} '
+        'ORDER BY week, sales_method, state',
+        conn, params=params,
+    )
+    #sqlite hands the sums back as REAL
+    counts = ['n'] + [f'{metric}_count' for metric in aggregates.METRICS]
+    cube = cube.astype(dict.fromkeys(counts, 'int64')).assign(sales_method=lambda cube: sales_method_category(cube['sales_method']))
+    medians = pd.read_sql_query('SELECT state, revenue FROM state_medians', conn).set_index('state')['revenue']
+    return aggregates.fill_missing_revenue(cube, medians)
+
+
+def kpis(conn, by=('sales_method',), week=None, sales_method=None, state=None):
+    """Rows, total and mean of every metric per `by` for the requested slice."""
+    cube = load_cube(conn, week, sales_method, state)
+    grouped = cube.groupby(list(by), observed=True)
+    table = grouped[['n']].sum()
+    for metric in aggregates.METRICS:
+        total = grouped[f'{metric}_sum'].sum()
+        table[f'{metric}_sum'] = total
+        table[f'{metric}_mean'] = total / grouped[f'{metric}_count'].sum()
+    return table.reset_index()
+
+
+def average_order_value(conn, week=None, state=None):
+    return aggregates.average_order_value(load_cube(conn, week=week, state=state))
+
+
+def weekly_revenue(conn, sales_method=None, state=None):
+    return aggregates.sales_per_week(load_cube(conn, sales_method=sales_method, state=state))
+
+
+def top_states(conn, metric='revenue', n=10, sales_method=None, week=None):
+    return aggregates.top_states(load_cube(conn, week=week, sales_method=sales_method), metric, n)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Materialised product sales KPIs.')
+    parser.add_argument('--db', default=STORE_PATH, help='SQLite file of the store')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    refresh_parser = commands.add_parser('refresh', help='load new or changed exports')
+    refresh_parser.add_argument('source', help="directory, glob such as 'exports/*.csv', or single file")
+    refresh_parser.add_argument('--workers', type=int, default=None)
+    refresh_parser.add_argument('--chunksize', type=int, default=CHUNKSIZE)
+    refresh_parser.add_argument('--prune', action='store_true', help='drop every partition not matching source')
+
+    query_parser = commands.add_parser('query', help='KPIs for a slice of the cube')
+    query_parser.add_argument('kpi', choices=['slice', 'aov', 'weekly', 'top-states'])
+    query_parser.add_argument('--by', nargs='+', default=['sales_method'], choices=aggregates.KEYS)
+    query_parser.add_argument('--week', type=int, nargs='+')
+    query_parser.add_argument('--sales-method', nargs='+')
+    query_parser.add_argument('--state', nargs='+')
+    query_parser.add_argument('--metric', default='revenue', choices=aggregates.METRICS)
+    query_parser.add_argument('--n', type=int, default=10)
+
+    args = parser.parse_args()
+    conn = connect(args.db)
+    if args.command == 'refresh':
+        refreshed, dropped = refresh(conn, args.source, args.workers, args.chunksize, prune=args.prune)
+        print(f'Partitions refreshed:{len(refreshed)}')
+        print(f'Partitions dropped:{len(dropped)}')
+    elif args.kpi == 'slice':
+        print(kpis(conn, args.by, args.week, args.sales_method, args.state).to_string(index=False))
+    elif args.kpi == 'aov':
+        print(average_order_value(conn, args.week, args.state).to_string())
+    elif args.kpi == 'weekly':
+        print(weekly_revenue(conn, args.sales_method, args.state).to_string(index=False))
+    else:
+        print(top_states(conn, args.metric, args.n, args.sales_method, args.week).to_string(index=False))
@@ -0,0 +1,108 @@
+"""Chunked ingestion and cleaning of ``product_sales.csv``.
+
+Nothing here holds more than one chunk of rows at a time. The per-state
+revenue median is found in a first pass from revenue value counts (which
+are bounded by the number of distinct cent values, not the number of rows)
+and the fill happens in a second pass, chunk by chunk.
+"""
+import numpy as np
+import pandas as pd
+
+from sales_analysis.cleaning import DTYPES, clean_chunk, fill_revenue
+
+CHUNKSIZE = 1_000_000
+
+##revenue is exported with two decimals, so rounding to cents keeps
+##the median exact while bounding the number of distinct values
+REVENUE_DECIMALS = 2
+
+
+def read_chunks(path, chunksize=CHUNKSIZE):
+    """Yield raw chunks of the export with compact dtypes."""
+    return pd.read_csv(path, dtype=DTYPES, chunksize=chunksize)
+
+
+def iter_clean_chunks(path, chunksize=CHUNKSIZE, current_year=None):
+    """Yield chunks of `path` with the row level cleaning rules applied."""
+    for chunk in read_chunks(path, chunksize):
+        yield clean_chunk(chunk, current_year)
+
+
+def revenue_counts(chunk):
+    """Count of each (state, revenue) pair in `chunk`, ignoring missing revenue."""
+    revenue = chunk['revenue'].round(REVENUE_DECIMALS)
+    return chunk.groupby([chunk['state'].astype(str), revenue]).size()
+
+
+def merge_revenue_counts(parts):
+    """Add up revenue counts from several chunks or files."""
+    parts = [part for part in parts if part is not None and len(part)]
+    if not parts:
+        return pd.Series(dtype='int64')
+    return pd.concat(parts).groupby(level=[0, 1]).sum()
+
+
+def medians_from_counts(counts):
+    """Median revenue per state from the (state, revenue) value counts.
+
+    Matches ``groupby('state')['revenue'].median()``: with an even number of
+    values the two middle ones are averaged.
+    """
+    medians = {}
+    for state, state_counts in counts.groupby(level=0):
+        values = state_counts.index.get_level_values(1).to_numpy()
+        order = np.argsort(values)
+        values = values[order]
+        cumulative = np.cumsum(state_counts.to_numpy()[order])
+        total = cumulative[-1]
+        lower = values[np.searchsorted(cumulative, (total - 1) // 2, side='right')]
+        upper = values[np.searchsorted(cumulative, total // 2, side='right')]
+        medians[state] = (lower + upper) / 2
+    return pd.Series(medians, name='revenue', dtype='float64').rename_axis('state')
+
+
+def state_revenue_medians(path, chunksize=CHUNKSIZE, current_year=None):
+    """First pass: median revenue per state over the cleaned rows of `path`."""
+    counts = pd.Series(dtype='int64')
+    for chunk in iter_clean_chunks(path, chunksize, current_year):
+        counts = merge_revenue_counts([counts, revenue_counts(chunk)])
+    return medians_from_counts(counts)
+
+
+def iter_cleaned(path, chunksize=CHUNKSIZE, current_year=None, state_medians=None):
+    """Yield fully cleaned chunks of `path`, revenue gaps included.
+
+    Makes the median pass first unless `state_medians` is given.
+    """
+    if state_medians is None:
+        state_medians = state_revenue_medians(path, chunksize, current_year)
+    for chunk in iter_clean_chunks(path, chunksize, current_year):
+        yield fill_revenue(chunk, state_medians)
+
+
+def clean_csv(path, out_path, chunksize=CHUNKSIZE, current_year=None):
+    """Stream `path` through the cleaning rules into `out_path`.
+
+    Returns the number of rows written.
+    """
+    rows = 0
+    header = True
+    for chunk in iter_cleaned(path, chunksize, current_year):
+        chunk.to_csv(out_path, mode='w' if header else 'a', header=header, index=False)
+        header = False
+        rows += len(chunk)
+    if header:
+        #empty input still gets a header
+        pd.DataFrame(columns=list(DTYPES)).to_csv(out_path, index=False)
+    return rows
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Clean a product sales export chunk by chunk.')
+    parser.add_argument('path', help='raw export, e.g. product_sales.csv')
+    parser.add_argument('out_path', help='where to write the cleaned csv')
+    parser.add_argument('--chunksize', type=int, default=CHUNKSIZE)
+    args = parser.parse_args()
+    print(f'Rows written:{clean_csv(args.path, args.out_path, args.chunksize)}')
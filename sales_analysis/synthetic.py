@@ -0,0 +1,103 @@
+"""Synthetic product sales exports with the schema and quirks of the real one.
+
+Six weeks, the three sales methods plus the ``em + call`` and ``email``
+typos, 50 states weighted roughly by population, right-skewed revenue that
+depends on the method and the number of items sold, about 7% of revenue
+missing and a handful of customers older than the business. Rows are
+produced in chunks, so exports far larger than memory can be written.
+"""
+import numpy as np
+import pandas as pd
+
+from sales_analysis.cleaning import max_years_as_customer
+from sales_analysis.streaming import CHUNKSIZE
+
+##share of each spelling in the real export
+SALES_METHOD_WEIGHTS = {
+    'Email': 0.4971,
+    'Call': 0.3302,
+    'Email + Call': 0.1705,
+    'em + call': 0.0015,
+    'email': 0.0007,
+}
+
+##mean revenue per item for each method, close to the real AOV / nb_sold
+REVENUE_PER_ITEM = {'Email': 9.7, 'Call': 4.9, 'Email + Call': 17.0, 'em + call': 17.0, 'email': 9.7}
+
+STATE_WEIGHTS = {
+    'California': 39.2, 'Texas': 29.5, 'Florida': 21.8, 'New York': 19.8, 'Pennsylvania': 13.0,
+    'Illinois': 12.7, 'Ohio': 11.8, 'Georgia': 10.8, 'North Carolina': 10.6, 'Michigan': 10.0,
+    'New Jersey': 9.3, 'Virginia': 8.6, 'Washington': 7.7, 'Arizona': 7.3, 'Massachusetts': 7.0,
+    'Tennessee': 7.0, 'Indiana': 6.8, 'Maryland': 6.2, 'Missouri': 6.2, 'Wisconsin': 5.9,
+    'Colorado': 5.8, 'Minnesota': 5.7, 'South Carolina': 5.2, 'Alabama': 5.0, 'Louisiana': 4.6,
+    'Kentucky': 4.5, 'Oregon': 4.2, 'Oklahoma': 4.0, 'Connecticut': 3.6, 'Utah': 3.3,
+    'Iowa': 3.2, 'Nevada': 3.1, 'Arkansas': 3.0, 'Mississippi': 2.9, 'Kansas': 2.9,
+    'New Mexico': 2.1, 'Nebraska': 2.0, 'Idaho': 1.9, 'West Virginia': 1.8, 'Hawaii': 1.4,
+    'New Hampshire': 1.4, 'Maine': 1.4, 'Rhode Island': 1.1, 'Montana': 1.1, 'Delaware': 1.0,
+    'South Dakota': 0.9, 'North Dakota': 0.8, 'Alaska': 0.7, 'Vermont': 0.6, 'Wyoming': 0.6,
+}
+
+MISSING_REVENUE = 0.072
+OUT_OF_RANGE_YEARS = 0.0002
+
+
+def _weights(mapping):
+    values = np.array(list(mapping.values()), dtype='float64')
+    return np.array(list(mapping)), values / values.sum()
+
+
+_HEX = np.frombuffer(b''.join(f'{byte:02x}'.encode() for byte in range(256)), dtype='S1').reshape(256, 2)
+
+
+def _customer_ids(n_rows, rng):
+    #uuid-looking ids built from random bytes without a Python loop per row
+    digits = _HEX[rng.integers(0, 256, (n_rows, 16))].reshape(n_rows, 32)
+    dash = np.full((n_rows, 1), b'-', dtype='S1')
+    parts = [digits[:, :8], dash, digits[:, 8:12], dash, digits[:, 12:16], dash, digits[:, 16:20], dash, digits[:, 20:]]
+    return np.ascontiguousarray(np.hstack(parts)).view('S36').ravel().astype(str)
+
+
+def generate_chunk(n_rows, rng):
+    """One chunk of `n_rows` synthetic export rows."""
+    methods, method_p = _weights(SALES_METHOD_WEIGHTS)
+    states, state_p = _weights(STATE_WEIGHTS)
+    sales_method = rng.choice(methods, n_rows, p=method_p)
+    week = rng.integers(1, 7, n_rows)
+    nb_sold = np.clip(np.round(rng.normal(10, 1.8, n_rows) + (week - 3.5) * 0.4), 7, 16).astype('int16')
+
+    per_item = pd.Series(sales_method).map(REVENUE_PER_ITEM).to_numpy()
+    #lognormal noise gives the long right tail of the real revenue
+    revenue = np.round(nb_sold * per_item * rng.lognormal(0, 0.12, n_rows), 2)
+    revenue[rng.random(n_rows) < MISSING_REVENUE] = np.nan
+
+    years = np.minimum(rng.geometric(0.18, n_rows) - 1, 39)
+    too_old = rng.random(n_rows) < OUT_OF_RANGE_YEARS
+    oldest = max_years_as_customer()
+    years[too_old] = rng.integers(oldest + 1, oldest + 25, too_old.sum())
+
+    return pd.DataFrame({
+        'week': week.astype('int8'),
+        'sales_method': sales_method,
+        'customer_id': _customer_ids(n_rows, rng),
+        'nb_sold': nb_sold,
+        'revenue': revenue,
+        'years_as_customer': years.astype('int16'),
+        'nb_site_visits': np.round(rng.normal(25, 3.5, n_rows)).astype('int16'),
+        'state': rng.choice(states, n_rows, p=state_p),
+    })
+
+
+def generate(n_rows, seed=0, chunksize=CHUNKSIZE):
+    """Yield chunks adding up to `n_rows` rows."""
+    rng = np.random.default_rng(seed)
+    for start in range(0, int(n_rows), chunksize):
+        yield generate_chunk(min(chunksize, int(n_rows) - start), rng)
+
+
+def write_csv(path, n_rows, seed=0, chunksize=CHUNKSIZE):
+    """Write a synthetic export of `n_rows` rows to `path`."""
+    header = True
+    for chunk in generate(n_rows, seed, chunksize):
+        chunk.to_csv(path, mode='w' if header else 'a', header=header, index=False)
+        header = False
+    return path
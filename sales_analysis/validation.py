@@ -0,0 +1,174 @@
+"""Data-quality checks on a raw export.
+
+Each rule keeps a state that is updated chunk by chunk, so every check
+shares one read of the file:
+
+- ``nulls``: missing values per column
+- ``range``: numeric values outside their allowed range, including
+  customers older than the business
+- ``sales_method``: values that are not an allowed sales method as
+  exported, and those still unknown after fixing the known typos
+- ``cardinality``: distinct values per column, from a HyperLogLog sketch
+- ``duplicates``: duplicate rows, found by hashing each row (keeps 8
+  bytes per row that is distinct within its chunk, sorted once at the end)
+
+`validate` and `validate_csv` return one row per (rule, column) with the
+count and the time spent in the rule. Exports are read with the nullable
+integer dtypes of `sales_analysis.cleaning`, so a missing week or nb_sold
+is counted by ``nulls`` instead of failing the read.
+"""
+import time
+
+import numpy as np
+import pandas as pd
+
+from sales_analysis.cleaning import SALES_METHOD_MAP, SALES_METHODS, max_years_as_customer
+from sales_analysis.streaming import CHUNKSIZE, read_chunks
+
+##inclusive bounds, None for unbounded
+RANGES = {
+    'week': (1, 6),
+    'nb_sold': (0, None),
+    'revenue': (0, None),
+    'years_as_customer': (0, max_years_as_customer()),
+    'nb_site_visits': (0, None),
+}
+
+##2**14 registers, about 0.8% standard error on distinct counts
+HLL_PRECISION = 14
+
+
+def _add(state, counts):
+    return counts if state is None else state.add(counts, fill_value=0)
+
+
+def _nulls(state, chunk):
+    return _add(state, chunk.isna().sum())
+
+
+def _ranges(state, chunk):
+    counts = {}
+    for column, (low, high) in RANGES.items():
+        values = chunk[column]
+        outside = pd.Series(False, index=values.index)
+        if low is not None:
+            outside |= values < low
+        if high is not None:
+            outside |= values > high
+        #missing values compare as NA; they are counted by the nulls rule
+        counts[column] = int(outside.fillna(False).sum())
+    return _add(state, pd.Series(counts))
+
+
+def _sales_method_counts(state, chunk):
+    #count each spelling once; the rule is then evaluated on a handful of values
+    return _add(state, chunk['sales_method'].value_counts())
+
+
+def _sales_method(counts):
+    mapped = counts.index.to_series().replace(SALES_METHOD_MAP)
+    return pd.Series({
+        'sales_method': counts[~counts.index.isin(SALES_METHODS)].sum(),
+        'sales_method (after mapping)': counts[~mapped.isin(SALES_METHODS).to_numpy()].sum(),
+    })
+
+
+def _hll_update(registers, values):
+    hashes = pd.util.hash_array(np.asarray(values))
+    index = (hashes >> np.uint64(64 - HLL_PRECISION)).astype(np.intp)
+    rest = hashes & np.uint64((1 << (64 - HLL_PRECISION)) - 1)
+    #position of the leftmost 1 bit in the remaining bits; frexp gives the bit length exactly below 2**53
+    rank = (64 - HLL_PRECISION) - np.frexp(rest.astype('float64'))[1] + 1
+    np.maximum.at(registers, index, rank.astype(np.uint8))
+    return registers
+
+
+def _hll_estimate(registers):
+    m = len(registers)
+    estimate = 0.7213 / (1 + 1.079 / m) * m * m / np.sum(np.ldexp(1.0, -registers.astype(int)))
+    empty = np.count_nonzero(registers == 0)
+    if estimate <= 2.5 * m and empty:
+        #linear counting is more accurate for small cardinalities
+        estimate = m * np.log(m / empty)
+    return round(estimate)
+
+
+def _cardinality(state, chunk):
+    if state is None:
+        state = {column: np.zeros(1 << HLL_PRECISION, dtype=np.uint8) for column in chunk.columns}
+    for column in chunk.columns:
+        values = chunk[column].dropna()
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            #every distinct value is one of the categories in use
+            values = values.cat.remove_unused_categories().cat.categories
+        _hll_update(state[column], values.to_numpy())
+    return state
+
+
+def _cardinality_estimates(state):
+    return pd.Series({column: _hll_estimate(registers) for column, registers in state.items()})
+
+
+def _duplicates(state, chunk):
+    #keep each chunk's distinct hashes; merging them once at the end avoids
+    #re-sorting everything seen so far on every chunk
+    parts, rows = state if state is not None else ([], 0)
+    hashes = pd.util.hash_pandas_object(chunk, index=False).to_numpy()
+    parts.append(np.unique(hashes))
+    return parts, rows + len(hashes)
+
+
+def _duplicate_count(state):
+    parts, rows = state
+    return pd.Series({'(row)': rows - len(np.unique(np.concatenate(parts)))})
+
+
+##name: (update(state, chunk) -> state, result(state) -> counts per column)
+RULES = {
+    'nulls': (_nulls, lambda state: state),
+    'range': (_ranges, lambda state: state),
+    'sales_method': (_sales_method_counts, _sales_method),
+    'cardinality': (_cardinality, _cardinality_estimates),
+    'duplicates': (_duplicates, _duplicate_count),
+}
+
+
+def validate_chunks(chunks, rules=None):
+    """Run `rules` (default: all of `RULES`) over an iterable of raw chunks."""
+    rules = {name: RULES[name] for name in (rules or RULES)}
+    states = dict.fromkeys(rules)
+    seconds = dict.fromkeys(rules, 0.0)
+    for chunk in chunks:
+        for name, (update, _) in rules.items():
+            start = time.perf_counter()
+            states[name] = update(states[name], chunk)
+            seconds[name] += time.perf_counter() - start
+
+    rows = []
+    for name, (_, result) in rules.items():
+        start = time.perf_counter()
+        counts = result(states[name]) if states[name] is not None else pd.Series(dtype='int64')
+        seconds[name] += time.perf_counter() - start
+        for column, count in counts.items():
+            rows.append({'rule': name, 'column': column, 'count': int(count), 'seconds': seconds[name]})
+    return pd.DataFrame(rows, columns=['rule', 'column', 'count', 'seconds'])
+
+
+def validate(df, rules=None):
+    """Validation report for a raw frame."""
+    return validate_chunks([df], rules)
+
+
+def validate_csv(path, chunksize=CHUNKSIZE, rules=None):
+    """Validation report for a raw export, read once in chunks."""
+    return validate_chunks(read_chunks(path, chunksize), rules)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Data-quality report for a product sales export.')
+    parser.add_argument('path', help='raw export, e.g. product_sales.csv')
+    parser.add_argument('--chunksize', type=int, default=CHUNKSIZE)
+    args = parser.parse_args()
+    print(validate_csv(args.path, args.chunksize).to_string(index=False))
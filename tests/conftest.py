@@ -0,0 +1,39 @@
+import pandas as pd
+import pytest
+
+from sales_analysis.cleaning import max_years_as_customer
+from sales_analysis.synthetic import write_csv
+
+ROWS = 20_000
+PARTS = 3
+
+
+def baseline(path):
+    """Cleaned frame the way ``product_sales.py`` always did it, whole file in pandas."""
+    df = pd.read_csv(path)
+    df = df[df['years_as_customer'] <= max_years_as_customer()].copy()
+    df['sales_method'] = df['sales_method'].replace({'em + call': 'Email + Call', 'email': 'Email'})
+    df['revenue'] = df['revenue'].fillna(df['state'].map(df.groupby('state')['revenue'].median()))
+    return df
+
+
+@pytest.fixture(scope='session')
+def export(tmp_path_factory):
+    """A synthetic export small enough to check against plain pandas."""
+    return str(write_csv(tmp_path_factory.mktemp('export') / 'product_sales.csv', ROWS, seed=1))
+
+
+@pytest.fixture(scope='session')
+def partitions(export, tmp_path_factory):
+    """The same rows split over several files."""
+    directory = tmp_path_factory.mktemp('parts')
+    df = pd.read_csv(export)
+    size = -(-len(df) // PARTS)
+    for part in range(PARTS):
+        df[part * size:(part + 1) * size].to_csv(directory / f'part{part}.csv', index=False)
+    return str(directory)
+
+
+@pytest.fixture(scope='session')
+def expected(export):
+    return baseline(export)
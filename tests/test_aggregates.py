@@ -0,0 +1,51 @@
+import pandas as pd
+import pytest
+
+from sales_analysis import aggregates
+from sales_analysis.streaming import iter_cleaned
+
+
+def _by_key(table):
+    #the cube orders sales methods by category, pandas alphabetically
+    return table.sort_values(['week', 'sales_method']).reset_index(drop=True)
+
+
+@pytest.fixture(scope='module')
+def cube(export):
+    return aggregates.aggregate_chunks(iter_cleaned(export, chunksize=3_000))
+
+
+def test_weekly_totals(cube, expected):
+    exact = expected.groupby(['week', 'sales_method'])[['nb_sold', 'revenue']].sum().reset_index()
+    table = aggregates.sales_per_week(cube).astype({'sales_method': 'str'})
+    pd.testing.assert_frame_equal(_by_key(table), _by_key(exact), check_dtype=False)
+
+
+def test_weekly_means(cube, expected):
+    exact = expected.groupby(['week', 'sales_method'])[['nb_sold', 'revenue']].mean().reset_index()
+    table = aggregates.avg_sales_per_week(cube).astype({'sales_method': 'str'})
+    pd.testing.assert_frame_equal(_by_key(table), _by_key(exact), check_dtype=False)
+
+
+def test_average_order_value(cube, expected):
+    exact = expected.groupby('sales_method')['revenue'].mean()
+    aov = aggregates.average_order_value(cube)
+    pd.testing.assert_series_equal(aov.rename(index=str).sort_index(), exact.sort_index(), check_names=False)
+
+
+@pytest.mark.parametrize('sales_method', [None, 'Call'])
+def test_top_states(cube, expected, sales_method):
+    rows = expected if sales_method is None else expected[expected['sales_method'] == sales_method]
+    exact = rows.groupby('state')['revenue'].sum().nlargest(10)
+    top = aggregates.top_states(cube, 'revenue', 10, sales_method)
+    assert list(top['state']) == list(exact.index)
+    assert top['revenue'].to_numpy() == pytest.approx(exact.to_numpy())
+
+
+def test_fill_after_aggregating_matches_fill_before(export):
+    from sales_analysis.streaming import iter_clean_chunks, state_revenue_medians
+
+    medians = state_revenue_medians(export)
+    unfilled = aggregates.aggregate_chunks(iter_clean_chunks(export))
+    filled = aggregates.aggregate_chunks(iter_cleaned(export, state_medians=medians))
+    pd.testing.assert_frame_equal(aggregates.fill_missing_revenue(unfilled, medians), filled, check_dtype=False)
@@ -0,0 +1,31 @@
+import os
+
+import pandas as pd
+import pytest
+
+from sales_analysis.cache import cache_path, clean_frame, load_clean
+
+pytest.importorskip('pyarrow')
+
+
+def test_cache_miss_and_hit_return_the_same_frame(export, tmp_path):
+    fresh = clean_frame(export)
+    built = load_clean(export, cache_dir=tmp_path)
+    assert os.path.exists(cache_path(export, tmp_path))
+    reused = load_clean(export, cache_dir=tmp_path)
+    pd.testing.assert_frame_equal(built, fresh)
+    pd.testing.assert_frame_equal(reused, fresh)
+
+
+def _writes_in_place(df):
+    try:
+        df.loc[df.index[0], 'revenue'] = 1.0
+    except ValueError:
+        return False
+    return True
+
+
+def test_cache_miss_and_hit_behave_the_same(export, tmp_path):
+    #the first call builds the cache, the second reuses it
+    outcomes = [_writes_in_place(load_clean(export, cache_dir=tmp_path)) for _ in range(2)]
+    assert outcomes[0] == outcomes[1]
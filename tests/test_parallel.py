@@ -0,0 +1,34 @@
+import pandas as pd
+import pytest
+
+from sales_analysis import aggregates
+from sales_analysis.parallel import analyse_files, kpi_tables
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_partitions_match_a_single_run(export, partitions, workers):
+    whole = analyse_files(export, workers=1, chunksize=4_000)
+    merged = analyse_files(partitions, workers=workers, chunksize=4_000)
+    pd.testing.assert_frame_equal(merged, whole, check_dtype=False)
+
+
+def test_partition_kpis_match_pandas(partitions, expected):
+    tables = kpi_tables(analyse_files(partitions, workers=2))
+    exact = expected.groupby('sales_method')['revenue'].mean()
+    aov = tables['AOV']['revenue']
+    pd.testing.assert_series_equal(aov.rename(index=str).sort_index(), exact.sort_index(), check_names=False)
+    exact_states = expected.groupby('state')['nb_sold'].sum().nlargest(10)
+    assert list(tables['top_states_nb_sold']['state']) == list(exact_states.index)
+
+
+def test_no_matching_files(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        analyse_files(str(tmp_path / '*.csv'))
+
+
+def test_state_medians_are_global(partitions, expected):
+    #revenue gaps in one file are filled with medians over every file
+    cube = analyse_files(partitions, workers=1)
+    totals = aggregates.state_segment(cube).set_index('state')['revenue']
+    exact = expected.groupby('state')['revenue'].sum()
+    assert totals.sort_index().to_numpy() == pytest.approx(exact.sort_index().to_numpy())
@@ -0,0 +1,80 @@
+import json
+import os
+
+import pandas as pd
+import pytest
+
+from sales_analysis.profiling import Tracer
+
+matplotlib = pytest.importorskip('matplotlib')
+matplotlib.use('Agg')
+
+FIELDS = ['stage', 'wall_seconds', 'cpu_seconds', 'start_seconds', 'rows_in', 'rows_out', 'memory_in_mb', 'memory_out_mb']
+
+
+def _frame(rows=1_000):
+    return pd.DataFrame({'state': ['Ohio', 'Iowa'] * (rows // 2), 'revenue': range(rows)})
+
+
+def test_walkthrough_records_every_stage(export, tmp_path):
+    import matplotlib.pyplot as plt
+
+    import product_sales
+
+    trace = tmp_path / 'trace.jsonl'
+    with Tracer(str(trace)) as tracer:
+        product_sales.main(export, tracer)
+    plt.close('all')
+
+    records = [json.loads(line) for line in trace.read_text().splitlines()]
+    stages = [record['stage'] for record in records]
+    for stage in ['load', 'validate', 'impute_revenue', 'kpis', 'correlation', 'plot:pairplot', 'aov']:
+        assert stage in stages
+    for record in records:
+        assert set(FIELDS + ['peak_rss_mb']) <= set(record)
+        assert record['wall_seconds'] >= 0 and record['cpu_seconds'] >= 0
+        assert record['peak_rss_mb'] > 0
+    load = records[stages.index('load')]
+    assert load['rows_out'] == len(pd.read_csv(export)) and load['memory_out_mb'] > 0
+    assert records[stages.index('aov')]['rows_out'] == 3
+
+
+def test_chrome_trace(tmp_path):
+    trace = tmp_path / 'trace.json'
+    df = _frame()
+    with Tracer(str(trace), fmt='chrome') as tracer:
+        with tracer.stage('median', df) as span:
+            span.output(df.groupby('state')['revenue'].median())
+        with tracer.stage('sort', df):
+            df.sort_values('revenue')
+
+    events = json.loads(trace.read_text())['traceEvents']
+    assert [event['name'] for event in events] == ['median', 'sort']
+    for event in events:
+        assert event['ph'] == 'X' and event['dur'] >= 0
+        assert set(FIELDS[1:]) - {'start_seconds'} <= set(event['args'])
+    assert events[0]['args']['rows_in'] == len(df) and events[0]['args']['rows_out'] == 2
+    assert events[1]['ts'] >= events[0]['ts'] + events[0]['dur']
+
+
+def test_tracemalloc_and_profile(tmp_path):
+    trace = tmp_path / 'trace.jsonl'
+    with Tracer(str(trace), profile=True, memory='tracemalloc') as tracer:
+        with tracer.stage('allocate'):
+            _frame(100_000)
+    record = json.loads(trace.read_text())
+    assert record['peak_alloc_mb'] > 0
+    assert os.path.exists(record['profile']) and record['profile_top']
+
+
+def test_no_path_records_nothing(tmp_path):
+    tracer = Tracer()
+    with tracer.stage('noop', _frame()) as span:
+        span.output(None)
+    tracer.close()
+    assert tracer.records == [] and os.listdir(tmp_path) == []
+
+
+def test_unknown_format():
+    with pytest.raises(ValueError):
+        Tracer('trace.txt', fmt='csv')
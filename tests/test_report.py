@@ -0,0 +1,42 @@
+import pandas as pd
+import pytest
+
+from sales_analysis import report
+from sales_analysis.cache import clean_frame, load_clean
+
+matplotlib = pytest.importorskip('matplotlib')
+matplotlib.use('Agg')
+
+
+@pytest.fixture(scope='module')
+def late_weeks(export, tmp_path_factory):
+    path = tmp_path_factory.mktemp('late') / 'late_weeks.csv'
+    df = pd.read_csv(export, nrows=4_000)
+    df[df['week'] >= 5].to_csv(path, index=False)
+    return str(path)
+
+
+def test_week_labels_follow_the_weeks_present(late_weeks):
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    data = report.figure_inputs(clean_frame(late_weeks))['sales_per_week']
+    fig = report.RENDERERS['sales_per_week'](plt, sns, data)
+    labels = [label.get_text() for label in fig.axes[0].get_yticklabels()]
+    plt.close(fig)
+    assert labels == ['week 5', 'week 6']
+
+
+def test_unchanged_figures_are_not_redrawn(late_weeks, tmp_path):
+    out_dir = tmp_path / 'report'
+    assert len(report.render_report(clean_frame(late_weeks), out_dir, workers=2)) == len(report.RENDERERS)
+    #the same data from the Arrow cache fingerprints the same
+    cached = load_clean(late_weeks, cache_dir=tmp_path / 'cache')
+    assert report.render_report(cached, out_dir, workers=2) == []
+
+
+def test_renderer_change_changes_the_fingerprint(late_weeks, monkeypatch):
+    data = report.figure_inputs(clean_frame(late_weeks))['sales_method_frequency']
+    before = report._fingerprint('sales_method_frequency', data)
+    monkeypatch.setitem(report.RENDERERS, 'sales_method_frequency', lambda plt, sns, data: None)
+    assert report._fingerprint('sales_method_frequency', data) != before
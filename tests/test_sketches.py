@@ -0,0 +1,73 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from sales_analysis.sketches import ALL, QuantileSketch, TopK, sketch_csv, sketch_files
+
+CAPACITY = 8
+
+
+def _split(df, n):
+    bounds = np.linspace(0, len(df), n + 1).astype(int)
+    return [df.iloc[start:end] for start, end in zip(bounds[:-1], bounds[1:])]
+
+
+@pytest.fixture(scope='module')
+def parts(expected):
+    return _split(expected, 5)
+
+
+def test_topk_bounds_hold_after_merging(parts, expected):
+    sketch = TopK(CAPACITY)
+    for part in parts:
+        partial = TopK(CAPACITY)
+        #several updates per partition, as chunks would
+        for chunk in _split(part, 3):
+            partial.update(chunk['state'].to_numpy(), chunk['revenue'].to_numpy(), ALL)
+            partial.update(chunk['state'].to_numpy(), chunk['revenue'].to_numpy(), chunk['sales_method'].to_numpy())
+        sketch.merge(partial)
+    #with fewer counters than states the estimates are approximate, so the bounds are exercised
+    assert (sketch.counters['error'] > 0).any()
+
+    for group, rows in [(ALL, expected)] + list(expected.groupby('sales_method')):
+        exact = rows.groupby('state')['revenue'].sum()
+        top = sketch.top(CAPACITY, group).set_index('item')
+        assert len(top) == CAPACITY
+        truth = exact[top.index]
+        assert ((top['count'] - top['error'] <= truth + 1e-6) & (truth <= top['count'] + 1e-6)).all()
+        #a state that was not kept totals at most the floor
+        assert exact.drop(top.index).max() <= sketch.floor[group] + 1e-6
+
+
+def test_topk_is_exact_within_capacity(expected):
+    sketch = TopK(64)
+    sketch.update(expected['state'].to_numpy(), expected['nb_sold'].to_numpy())
+    top = sketch.top(10)
+    exact = expected.groupby('state')['nb_sold'].sum().nlargest(10)
+    assert list(top['item']) == list(exact.index)
+    assert (top['error'] == 0).all()
+
+
+@pytest.mark.parametrize('relative_accuracy', [0.01, 0.05])
+def test_quantiles_within_relative_accuracy(parts, expected, relative_accuracy):
+    sketch = QuantileSketch(relative_accuracy)
+    for part in parts:
+        partial = QuantileSketch(relative_accuracy)
+        partial.update(part['revenue'].to_numpy(), part['sales_method'].to_numpy())
+        sketch.merge(partial)
+
+    q = [0.01, 0.25, 0.5, 0.75, 0.99]
+    table = sketch.quantiles(q)
+    for method, rows in expected.groupby('sales_method'):
+        #the sketch returns the value at rank q * (n - 1), rounded down
+        exact = rows['revenue'].quantile(q, interpolation='lower')
+        estimate = table.loc[method, q].to_numpy(dtype='float64')
+        assert np.all(np.abs(estimate - exact.to_numpy()) <= relative_accuracy * exact.to_numpy() + 1e-9)
+
+
+def test_split_export_matches_whole_file(export, partitions):
+    whole = sketch_csv(export)
+    merged = sketch_files(partitions)
+    for metric in ['revenue', 'nb_sold']:
+        pd.testing.assert_frame_equal(merged.top_ten_states(metric), whole.top_ten_states(metric))
+    pd.testing.assert_frame_equal(merged.revenue_quantiles(), whole.revenue_quantiles())
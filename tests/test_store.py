@@ -0,0 +1,92 @@
+import os
+import shutil
+
+import pandas as pd
+import pytest
+
+from sales_analysis import aggregates, store
+from sales_analysis.parallel import analyse_files
+
+
+@pytest.fixture
+def conn(tmp_path):
+    conn = store.connect(str(tmp_path / 'kpis.sqlite'))
+    yield conn
+    conn.close()
+
+
+@pytest.fixture
+def exports(partitions, tmp_path):
+    directory = tmp_path / 'exports'
+    shutil.copytree(partitions, directory)
+    return str(directory)
+
+
+def test_slices_match_aggregates(conn, exports):
+    refreshed, dropped = store.refresh(conn, exports, workers=2)
+    assert len(refreshed) == len(os.listdir(exports)) and dropped == []
+    cube = analyse_files(exports, workers=1)
+
+    pd.testing.assert_series_equal(store.average_order_value(conn), aggregates.average_order_value(cube))
+    pd.testing.assert_frame_equal(store.weekly_revenue(conn), aggregates.sales_per_week(cube), check_dtype=False)
+    pd.testing.assert_frame_equal(
+        store.top_states(conn, 'revenue', 10, sales_method='Email'),
+        aggregates.top_states(cube, 'revenue', 10, 'Email'),
+        check_dtype=False,
+    )
+    week = cube[cube['week'] == 3]
+    table = store.kpis(conn, by=['state'], week=3).set_index('state')
+    assert table['n'].to_dict() == week.groupby('state')['n'].sum().to_dict()
+
+
+def test_refresh_only_reads_changed_files(conn, exports):
+    store.refresh(conn, exports, workers=1)
+    assert store.refresh(conn, exports, workers=1) == ([], [])
+
+
+def test_moved_export_is_not_counted_twice(conn, exports, tmp_path):
+    store.refresh(conn, exports, workers=1)
+    rows = store.kpis(conn)['n'].sum()
+    moved = tmp_path / 'moved'
+    shutil.move(exports, moved)
+    refreshed, dropped = store.refresh(conn, str(moved), workers=1)
+    assert len(refreshed) == len(dropped)
+    assert store.kpis(conn)['n'].sum() == rows
+
+
+def test_prune_drops_partitions_outside_the_source(conn, exports):
+    store.refresh(conn, exports, workers=1)
+    first = sorted(os.listdir(exports))[0]
+    _, dropped = store.refresh(conn, os.path.join(exports, first), workers=1, prune=True)
+    assert len(dropped) == len(os.listdir(exports)) - 1
+    expected = analyse_files(os.path.join(exports, first))
+    assert store.kpis(conn)['n'].sum() == expected['n'].sum()
+
+
+def test_merged_cube_follows_changed_and_dropped_files(conn, exports):
+    store.refresh(conn, exports, workers=1)
+    paths = sorted(os.path.join(exports, name) for name in os.listdir(exports))
+    changed = pd.read_csv(paths[0])
+    changed[: len(changed) // 2].to_csv(paths[0], index=False)
+    os.remove(paths[1])
+    refreshed, dropped = store.refresh(conn, exports, workers=1)
+    assert refreshed == [os.path.abspath(paths[0])] and dropped == [os.path.abspath(paths[1])]
+
+    cube = analyse_files(exports, workers=1)
+    pd.testing.assert_series_equal(store.average_order_value(conn), aggregates.average_order_value(cube))
+    assert store.kpis(conn)['n'].sum() == cube['n'].sum()
+
+
+def test_unchanged_files_are_not_hashed(conn, exports, monkeypatch):
+    store.refresh(conn, exports, workers=1)
+    hashed = []
+    monkeypatch.setattr(store, 'file_hash', lambda path: hashed.append(path) or 'changed')
+    assert store.refresh(conn, exports, workers=1) == ([], [])
+    assert hashed == []
+
+
+def test_touched_file_is_hashed_but_not_read(conn, exports):
+    store.refresh(conn, exports, workers=1)
+    path = os.path.join(exports, sorted(os.listdir(exports))[0])
+    os.utime(path, (0, 0))
+    assert store.refresh(conn, exports, workers=1) == ([], [])
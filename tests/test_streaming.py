@@ -0,0 +1,80 @@
+import pandas as pd
+import pytest
+
+from sales_analysis.cleaning import max_years_as_customer
+from sales_analysis.streaming import clean_csv, state_revenue_medians
+
+CHUNKSIZE = 3_000
+
+
+def test_state_medians_are_exact(export, expected):
+    cleaned = pd.read_csv(export)
+    cleaned = cleaned[cleaned.index.isin(expected.index)]
+    medians = state_revenue_medians(export, CHUNKSIZE)
+    exact = cleaned.groupby('state')['revenue'].median()
+    pd.testing.assert_series_equal(medians.sort_index(), exact.sort_index(), check_names=False)
+
+
+def test_clean_csv_matches_whole_frame(export, expected, tmp_path):
+    out_path = tmp_path / 'clean.csv'
+    rows = clean_csv(export, out_path, CHUNKSIZE)
+    cleaned = pd.read_csv(out_path)
+    assert rows == len(expected)
+    pd.testing.assert_frame_equal(cleaned, expected.reset_index(drop=True), check_dtype=False)
+
+
+def test_even_count_median_averages_the_middle_values(tmp_path):
+    path = tmp_path / 'even.csv'
+    pd.DataFrame({
+        'week': [1, 1, 1, 1],
+        'sales_method': ['Email'] * 4,
+        'customer_id': list('abcd'),
+        'nb_sold': [10] * 4,
+        'revenue': [10.0, 20.0, 30.0, 40.0],
+        'years_as_customer': [1] * 4,
+        'nb_site_visits': [20] * 4,
+        'state': ['Ohio'] * 4,
+    }).to_csv(path, index=False)
+    assert state_revenue_medians(path, chunksize=3)['Ohio'] == pytest.approx(25.0)
+
+
+@pytest.fixture
+def messy_export(export, tmp_path):
+    df = pd.read_csv(export, nrows=2_000)
+    df.loc[:99, 'sales_method'] = 'Email '
+    df.loc[200:204, 'nb_sold'] = None
+    df.loc[300, 'years_as_customer'] = None
+    df.loc[400, 'week'] = None
+    path = tmp_path / 'messy.csv'
+    df.to_csv(path, index=False)
+    return path, df
+
+
+def test_unknown_sales_methods_are_kept(messy_export, tmp_path):
+    path, df = messy_export
+    out_path = tmp_path / 'clean.csv'
+    clean_csv(path, out_path, chunksize=300)
+    methods = pd.read_csv(out_path)['sales_method']
+    assert methods.notna().all()
+    assert (methods == 'Email ').sum() == 100
+
+
+def test_missing_integers_are_read_and_kept(messy_export, tmp_path):
+    path, df = messy_export
+    out_path = tmp_path / 'clean.csv'
+    rows = clean_csv(path, out_path, chunksize=300)
+    cleaned = pd.read_csv(out_path)
+    #only the row without a week is dropped; the others keep their gaps
+    kept = df[df['week'].notna() & ~(df['years_as_customer'] > max_years_as_customer()).fillna(False)]
+    assert rows == len(kept)
+    assert cleaned['nb_sold'].isna().sum() == 5
+    assert cleaned['years_as_customer'].isna().sum() == 1
+
+
+def test_unknown_sales_methods_reach_the_kpis(messy_export):
+    from sales_analysis.parallel import analyse_files
+
+    path, df = messy_export
+    cube = analyse_files(str(path), workers=1, chunksize=300)
+    assert cube['n'].sum() == df['week'].notna().sum() - (df['years_as_customer'] > max_years_as_customer()).sum()
+    assert cube.loc[cube['sales_method'] == 'Email ', 'n'].sum() == 100
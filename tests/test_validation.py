@@ -0,0 +1,73 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from sales_analysis import validation
+from sales_analysis.cleaning import SALES_METHOD_MAP, max_years_as_customer
+
+#about three standard errors of the sketch
+HLL_TOLERANCE = 3 * 1.04 / np.sqrt(2 ** validation.HLL_PRECISION)
+
+
+@pytest.fixture(scope='module')
+def raw(export):
+    df = pd.read_csv(export, nrows=8_000)
+    df.loc[10:29, 'revenue'] = None
+    df.loc[40:44, 'nb_sold'] = None
+    df.loc[50:52, 'week'] = 9
+    df.loc[60:63, 'nb_site_visits'] = -1
+    df.loc[70:75, 'years_as_customer'] = max_years_as_customer() + 5
+    df.loc[80:84, 'sales_method'] = 'Email '
+    df.loc[85:86, 'sales_method'] = 'em + call'
+    #duplicates, some of them twice, spread over several chunks
+    return pd.concat([df, df.iloc[100:150], df.iloc[5_000:5_010], df.iloc[100:110]], ignore_index=True)
+
+
+@pytest.fixture(scope='module')
+def report(raw, tmp_path_factory):
+    path = tmp_path_factory.mktemp('raw') / 'raw.csv'
+    raw.to_csv(path, index=False)
+    #a chunk size smaller than the file, so every rule merges state across chunks
+    return validation.validate_csv(path, chunksize=1_500).set_index(['rule', 'column'])['count']
+
+
+def test_nulls(report, raw):
+    for column, count in raw.isna().sum().items():
+        assert report['nulls', column] == count
+
+
+def test_ranges(report, raw):
+    for column, (low, high) in validation.RANGES.items():
+        values = raw[column]
+        outside = ((values < low) if low is not None else False) | ((values > high) if high is not None else False)
+        assert report['range', column] == outside.sum()
+
+
+def test_sales_method(report, raw):
+    methods = raw['sales_method']
+    assert report['sales_method', 'sales_method'] == (~methods.isin(validation.SALES_METHODS)).sum()
+    after = methods.replace(SALES_METHOD_MAP)
+    assert report['sales_method', 'sales_method (after mapping)'] == (~after.isin(validation.SALES_METHODS)).sum() > 0
+
+
+def test_duplicates(report, raw):
+    assert report['duplicates', '(row)'] == raw.duplicated().sum() > 0
+
+
+def test_cardinality(report, raw):
+    for column, exact in raw.nunique().items():
+        assert report['cardinality', column] == pytest.approx(exact, rel=HLL_TOLERANCE, abs=1)
+
+
+def test_one_frame_matches_chunks(raw, report):
+    whole = validation.validate(raw).set_index(['rule', 'column'])['count']
+    pd.testing.assert_series_equal(whole, report)
+
+
+def test_hll_counts_large_cardinalities():
+    registers = np.zeros(1 << validation.HLL_PRECISION, dtype=np.uint8)
+    for start in range(0, 200_000, 50_000):
+        validation._hll_update(registers, np.arange(start, start + 50_000))
+    #repeated values don't change the estimate
+    validation._hll_update(registers, np.arange(0, 50_000))
+    assert validation._hll_estimate(registers) == pytest.approx(200_000, rel=HLL_TOLERANCE)